@@ -0,0 +1,87 @@
+# benchmarks/rerun_latency.py
+"""
+Measures cold import time of the app modules and the latency of Streamlit
+script reruns (what a sidebar interaction costs).
+
+Usage (from the repository root):
+    python benchmarks/rerun_latency.py [--reruns 20]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Every utils module main_app.py loads, directly or through utils.campaign.
+MODULES = [
+    "utils.text_extractor",
+    "utils.profiler",
+    "utils.ai_helper",
+    "utils.prompt_builder",
+    "utils.content_validator",
+    "utils.site_summary",
+    "utils.excel_writer",
+    "utils.campaign",
+]
+# main_app.py's utils imports together, i.e. the app's whole import chain.
+APP_IMPORTS = "utils.campaign, utils.excel_writer"
+
+def measure_cold_import(module_name):
+    """Imports a module in a fresh interpreter and returns the elapsed seconds."""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module_name}; print(time.perf_counter() - start)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+def measure_reruns(reruns):
+    """Runs main_app.py headlessly and times the first run and each rerun."""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(REPO_ROOT, "main_app.py"), default_timeout=60)
+    start = time.perf_counter()
+    app.run()
+    first_run = time.perf_counter() - start
+
+    timings = []
+    for i in range(reruns):
+        # Touch a sidebar widget, as a user would, then rerun. run() rebuilds the
+        # element tree, so the slider is looked up again each time.
+        content_count = next(s for s in app.sidebar.slider if s.label.startswith("Content Versions"))
+        content_count.set_value(1 + i % 20)
+        start = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - start)
+    return first_run, timings
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=20, help="Number of reruns to time.")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+
+    print("Cold import time:")
+    for module_name in MODULES:
+        print(f"  {module_name:<24} {measure_cold_import(module_name) * 1000:8.1f} ms")
+    print(f"  {'(all main_app imports)':<24} {measure_cold_import(APP_IMPORTS) * 1000:8.1f} ms")
+
+    first_run, timings = measure_reruns(args.reruns)
+    print(f"First script run:          {first_run * 1000:8.1f} ms")
+    print(f"Rerun latency (n={len(timings)}):")
+    print(f"  median                   {statistics.median(timings) * 1000:8.1f} ms")
+    print(f"  p95                      {percentile(timings, 95) * 1000:8.1f} ms")
+    print(f"  max                      {max(timings) * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
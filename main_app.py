@@ -1,36 +1,46 @@
 # main_app.py
 import streamlit as st
-from urllib.parse import urlparse
+import argparse
+import sys
 import time
 import json
-
-from utils.text_extractor import extract_text_from_url, extract_text_from_file
-from utils.ai_helper import summarize_text_with_ai, generate_content_with_ai
-from utils.prompt_builder import (
-    get_combined_context, create_email_prompt,
-    create_linkedin_facebook_prompt, create_google_search_prompt,
-    create_google_display_prompt, create_reasoning_prompt
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from utils.text_extractor import MAX_UPLOAD_BYTES, DEFAULT_MAX_PAGES
+from utils.campaign import (
+    build_campaign_context, generate_campaign, has_ad_content,
+    count_context_steps, count_generation_steps, get_company_name_from_url,
+    DEFAULT_AD_LINKS, DEFAULT_OBJECTIVE_LINKS
 )
-from utils.excel_writer import create_excel_report
+from utils.excel_writer import create_excel_report, create_zip_archive
+from utils.ai_helper import get_openai_api_key
+from utils.profiler import StageProfiler, profile_stage
 
 st.set_page_config(page_title="Branding & Marketing AI Tool", layout="wide")
 
+# Command-line options go after "--": streamlit run main_app.py -- --profile
+cli_parser = argparse.ArgumentParser(add_help=False)
+cli_parser.add_argument("--profile", action="store_true", help="Enable per-stage CPU/memory profiling by default.")
+cli_args, _ = cli_parser.parse_known_args(sys.argv[1:])
+
+LOGO_URL = "https://streamlit.io/images/brand/streamlit-logo-secondary-colormark-darktext.png"
+
 # --- Helper Functions ---
-def get_company_name_from_url(url):
-    if not url:
-        return "brand"
+@st.cache_data(show_spinner=False, ttl=24 * 60 * 60)
+def load_logo(url=LOGO_URL):
+    """
+    Fetches the logo once and serves the cached bytes on every rerun. A failed
+    fetch caches the URL instead, so st.image hands it to the browser without
+    the server retrying (and waiting on) the download each rerun.
+    """
+    import requests
     try:
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-        parsed_url = urlparse(url)
-        domain_parts = parsed_url.netloc.split('.')
-        if len(domain_parts) > 2 and domain_parts[-2] not in ['co', 'com', 'org', 'net', 'gov', 'edu']:
-            return domain_parts[-2]
-        elif len(domain_parts) > 1:
-             return domain_parts[-2] if len(domain_parts) > 2 else domain_parts[0]
-        return domain_parts[0] if domain_parts else "brand"
-    except Exception:
-        return "brand"
+        response = requests.get(url, timeout=5)
+        response.raise_for_status()
+        return response.content
+    except requests.RequestException:
+        return url
 
 # --- UI ---
 st.title("🚀 AI-Powered Branding & Marketing Content Generator")
@@ -43,8 +53,14 @@ if 'excel_bytes' not in st.session_state:
     st.session_state.excel_bytes = None
 if 'excel_filename' not in st.session_state:
     st.session_state.excel_filename = ""
+if 'reports' not in st.session_state:
+    st.session_state.reports = [] # (lead_objective, excel_bytes, filename) per objective
 if 'error_messages' not in st.session_state:
     st.session_state.error_messages = []
+if 'profile_bytes' not in st.session_state:
+    st.session_state.profile_bytes = None
+if 'profile_filename' not in st.session_state:
+    st.session_state.profile_filename = ""
 
 
 # --- Inputs ---
@@ -52,26 +68,56 @@ st.sidebar.header("⚙️ Configuration")
 
 st.sidebar.subheader("1. Company Context")
 client_url = st.sidebar.text_input("Client's Website URL (e.g., example.com)", "")
-additional_context_file = st.sidebar.file_uploader("Upload Additional Context (PDF/PPTX)", type=['pdf', 'pptx'])
-downloadable_material_file = st.sidebar.file_uploader("Upload Downloadable Lead Material (PDF/PPTX)", type=['pdf', 'pptx'])
+max_site_pages = st.sidebar.slider(
+    "Website Pages to Crawl", 1, 25, DEFAULT_MAX_PAGES,
+    help="Same-site pages crawled from the URL above. Each extra page adds its summary to every generation prompt."
+)
+use_site_cache = st.sidebar.checkbox(
+    "Reuse summaries of unchanged pages", value=True,
+    help="Only pages that are new or changed since the last run of this site are summarized again."
+)
+upload_limit_help = f"Max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB per file."
+additional_context_file = st.sidebar.file_uploader("Upload Additional Context (PDF/PPTX)", type=['pdf', 'pptx'], help=upload_limit_help)
+downloadable_material_file = st.sidebar.file_uploader("Upload Downloadable Lead Material (PDF/PPTX)", type=['pdf', 'pptx'], help=upload_limit_help)
 
 st.sidebar.subheader("2. Campaign Details")
-lead_objective_options = ["Demo Booking", "Sales Meeting"]
-lead_objective_choice = st.sidebar.selectbox("Primary Lead Objective", lead_objective_options)
+lead_objective_options = list(DEFAULT_OBJECTIVE_LINKS)
+multi_objective_mode = st.sidebar.checkbox("Generate for multiple lead objectives", help="Builds the context once and generates one report per objective.")
+if multi_objective_mode:
+    lead_objective_choices = st.sidebar.multiselect("Lead Objectives", lead_objective_options, default=lead_objective_options)
+else:
+    lead_objective_choices = [st.sidebar.selectbox("Primary Lead Objective", lead_objective_options)]
 
 content_count = st.sidebar.slider("Content Versions per Objective (Email, LinkedIn, Facebook)", 1, 20, 1)
 
 st.sidebar.subheader("3. Links for Ads")
-learn_more_link = st.sidebar.text_input("Link for 'Learn More' (Brand Awareness)", "https://example.com/learn-more")
-downloadable_material_link = st.sidebar.text_input("Link to Downloadable Material (Demand Gen)", "https://example.com/whitepaper-download")
-objective_link_default = "https://example.com/book-demo" if lead_objective_choice == "Demo Booking" else "https://example.com/contact-sales"
-objective_link = st.sidebar.text_input(f"Link for '{lead_objective_choice}' (Demand Capture)", objective_link_default)
+learn_more_link = st.sidebar.text_input("Link for 'Learn More' (Brand Awareness)", DEFAULT_AD_LINKS['learn_more'])
+downloadable_material_link = st.sidebar.text_input("Link to Downloadable Material (Demand Gen)", DEFAULT_AD_LINKS['downloadable'])
+
+links_by_objective = {}
+for lead_objective_choice in lead_objective_choices:
+    if multi_objective_mode:
+        # Each objective gets its own link set, defaulting to the shared links above.
+        with st.sidebar.expander(f"Links for '{lead_objective_choice}'"):
+            links_by_objective[lead_objective_choice] = {
+                'learn_more': st.text_input("Learn More", learn_more_link, key=f"learn_more_{lead_objective_choice}"),
+                'downloadable': st.text_input("Downloadable Material", downloadable_material_link, key=f"downloadable_{lead_objective_choice}"),
+                'objective_link': st.text_input(f"'{lead_objective_choice}' (Demand Capture)", DEFAULT_OBJECTIVE_LINKS[lead_objective_choice], key=f"objective_link_{lead_objective_choice}"),
+            }
+    else:
+        objective_link = st.sidebar.text_input(f"Link for '{lead_objective_choice}' (Demand Capture)", DEFAULT_OBJECTIVE_LINKS[lead_objective_choice])
+        links_by_objective[lead_objective_choice] = {
+            'learn_more': learn_more_link,
+            'downloadable': downloadable_material_link,
+            'objective_link': objective_link
+        }
 
-links_for_ads = {
-    'learn_more': learn_more_link,
-    'downloadable': downloadable_material_link,
-    'objective_link': objective_link
-}
+st.sidebar.subheader("4. Diagnostics")
+profiling_enabled = st.sidebar.checkbox(
+    "Profile CPU & memory per stage", value=cli_args.profile,
+    help="Runs each pipeline stage under cProfile and tracemalloc and offers a downloadable report. "
+         "Objectives are processed one at a time while profiling so each stage can be attributed."
+)
 
 # --- Main Area ---
 col1, col2 = st.columns([0.7, 0.3])
@@ -80,13 +126,25 @@ with col1:
     st.header("Generated Ad Content Preview")
     if st.session_state.generation_complete and st.session_state.excel_bytes:
         st.success(f"Excel report '{st.session_state.excel_filename}' generated successfully!")
+        download_mime = "application/zip" if st.session_state.excel_filename.endswith(".zip") else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         st.download_button(
             label=f"📥 Download {st.session_state.excel_filename}",
             data=st.session_state.excel_bytes,
             file_name=st.session_state.excel_filename,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            mime=download_mime
         )
+        if len(st.session_state.reports) > 1:
+            for lead_objective, report_bytes, report_filename in st.session_state.reports:
+                st.download_button(
+                    label=f"📄 {lead_objective}: {report_filename}",
+                    data=report_bytes,
+                    file_name=report_filename,
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    key=f"download_{report_filename}"
+                )
         st.info("The Excel file contains multiple sheets: Email, LinkedIn, FaceBook, Google Search, Google Display, and Reasoning.")
+        for error in dict.fromkeys(st.session_state.error_messages):
+            st.warning(error)
     elif st.session_state.error_messages:
         unique_errors = list(dict.fromkeys(st.session_state.error_messages))
         for error in unique_errors:
@@ -94,177 +152,136 @@ with col1:
     else:
         st.info("Configure inputs in the sidebar and click 'Generate Content' to begin.")
 
+    if st.session_state.profile_bytes:
+        st.download_button(
+            label=f"📊 Download profiling report ({st.session_state.profile_filename})",
+            data=st.session_state.profile_bytes,
+            file_name=st.session_state.profile_filename,
+            mime="application/zip",
+            help="profile_report.txt plus one .prof file per stage (open with pstats, snakeviz or tuna)."
+        )
+
 with col2:
-    st.image("https://streamlit.io/images/brand/streamlit-logo-secondary-colormark-darktext.png", width=200)
+    st.image(load_logo(), width=200)
     if st.sidebar.button("✨ Generate Content", type="primary", use_container_width=True):
         st.session_state.generation_complete = False
         st.session_state.excel_bytes = None
         st.session_state.excel_filename = ""
+        st.session_state.reports = []
         st.session_state.error_messages = []
+        st.session_state.profile_bytes = None
+        st.session_state.profile_filename = ""
 
         if not client_url:
             st.sidebar.error("Client's Website URL is required.")
             st.stop()
 
-        api_key = st.secrets.get("OPENAI_API_KEY")
-        if not api_key:
-            st.sidebar.error("OpenAI API key not found in secrets.toml.")
+        if not lead_objective_choices:
+            st.sidebar.error("Select at least one lead objective.")
             st.stop()
 
+        if not get_openai_api_key():
+            st.sidebar.error("OpenAI API key not found. Set OPENAI_API_KEY or add it to secrets.toml.")
+            st.stop()
+
+        profiler = StageProfiler() if profiling_enabled else None
+
         progress_bar = st.sidebar.progress(0)
         status_text = st.sidebar.empty()
 
-        total_steps = 5
-        total_steps += content_count
-        total_steps += 3 * content_count
-        total_steps += 3 * content_count
-        total_steps += 2
-        total_steps += 1
-        total_steps += 1
-        
-        current_step = 0 
+        total_steps = count_context_steps()
+        total_steps += len(lead_objective_choices) * (count_generation_steps(content_count) + 1) # +1 per Excel report
+
+        current_step = 0
+        latest_message = ""
+        progress_lock = threading.Lock()
 
         def update_progress(message):
-            global current_step
-            current_step += 1
-            progress_value = min(1.0, current_step / total_steps if total_steps > 0 else 0)
+            # Only counts the step: worker threads call this too, and Streamlit
+            # elements may only be updated from the script thread (refresh_progress).
+            global current_step, latest_message
+            with progress_lock:
+                current_step += 1
+                latest_message = message
+
+        def refresh_progress():
+            with progress_lock:
+                progress_value = min(1.0, current_step / total_steps if total_steps > 0 else 0)
+                message = latest_message
             progress_bar.progress(progress_value)
             status_text.info(f"⏳ {message}")
 
-        all_ad_data = {
-            'email': [], 'linkedin': [], 'facebook': [],
-            'google_search': {}, 'google_display': {},
-            'reasoning': {}
-        }
-        summaries = {'url': None, 'additional': None, 'downloadable': None}
+        def report_progress(message):
+            update_progress(message)
+            refresh_progress()
+
+        cancel_event = threading.Event()
+
+        def run_objective(lead_objective, progress=update_progress):
+            all_ad_data, errors = generate_campaign(
+                full_context_for_prompts, summaries, lead_objective,
+                links_by_objective[lead_objective], content_count, progress, profiler, cancel_event
+            )
+            if cancel_event.is_set():
+                return None, errors
+            if not has_ad_content(all_ad_data):
+                errors.append(f"{lead_objective}: No content to create Excel report.")
+                return None, errors
+            update_progress(f"Creating Excel report for {lead_objective}...")
+            company_name_for_file = get_company_name_from_url(client_url)
+            ad_rows = sum(len(all_ad_data[key]) for key in ['email', 'linkedin', 'facebook'])
+            with profile_stage(profiler, f"excel_report [{lead_objective}]", ad_rows=ad_rows):
+                excel_bytes, excel_filename = create_excel_report(all_ad_data, company_name_for_file, lead_objective)
+            return (lead_objective, excel_bytes, excel_filename), errors
 
         try:
-            # 1. Extract and Summarize Context
-            update_progress("Extracting website content...")
-            url_text = extract_text_from_url(client_url)
-            if "Error" in (url_text or ""):
-                st.session_state.error_messages.append(f"URL Text Extraction: {url_text}")
+            # 1. Extract and Summarize Context (once, shared by every objective)
+            summaries, full_context_for_prompts, context_errors = build_campaign_context(
+                client_url, additional_context_file, downloadable_material_file, report_progress, profiler,
+                max_pages=max_site_pages, use_site_cache=use_site_cache
+            )
+            st.session_state.error_messages.extend(context_errors)
+
+            # 2. Generate Ad Content & 3. Create Excel Reports
+            results = {}
+            if len(lead_objective_choices) == 1 or profiler:
+                # On the script thread, so Stop/rerun interrupt between requests and
+                # st.warning/st.error from the AI helpers reach the page.
+                # Profiled stages must not overlap, so objectives also run one at a time when profiling.
+                for lead_objective in lead_objective_choices:
+                    results[lead_objective] = run_objective(lead_objective, report_progress)
             else:
-                update_progress("Summarizing website content...")
-                summaries['url'] = summarize_text_with_ai(url_text)
-                if "Error" in (summaries['url'] or ""): st.session_state.error_messages.append(f"URL Summary: {summaries['url']}")
-
-
-            if additional_context_file:
-                update_progress("Extracting additional context...")
-                additional_text = extract_text_from_file(additional_context_file)
-                if "Error" in (additional_text or ""):
-                     st.session_state.error_messages.append(f"Additional Context Extraction: {additional_text}")
+                # One objective per worker. Stop/rerun surfaces here as an exception
+                # from refresh_progress; the workers then stop after their current request.
+                executor = ThreadPoolExecutor(max_workers=len(lead_objective_choices))
+                try:
+                    pending = {executor.submit(run_objective, objective): objective for objective in lead_objective_choices}
+                    while pending:
+                        done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            results[pending.pop(future)] = future.result()
+                        refresh_progress()
+                except BaseException:
+                    cancel_event.set()
+                    raise
+                finally:
+                    executor.shutdown(wait=False, cancel_futures=True)
+
+            for lead_objective in lead_objective_choices:
+                report, errors = results[lead_objective]
+                prefix = f"[{lead_objective}] " if len(lead_objective_choices) > 1 else ""
+                st.session_state.error_messages.extend(prefix + error for error in errors)
+                if report:
+                    st.session_state.reports.append(report)
+
+            if st.session_state.reports:
+                if len(st.session_state.reports) == 1:
+                    _, excel_bytes, excel_filename = st.session_state.reports[0]
                 else:
-                    update_progress("Summarizing additional context...")
-                    summaries['additional'] = summarize_text_with_ai(additional_text)
-                    if "Error" in (summaries['additional'] or ""): st.session_state.error_messages.append(f"Additional Context Summary: {summaries['additional']}")
-
-
-            if downloadable_material_file:
-                update_progress("Extracting downloadable material...")
-                downloadable_text = extract_text_from_file(downloadable_material_file)
-                if "Error" in (downloadable_text or ""):
-                    st.session_state.error_messages.append(f"Downloadable Material Extraction: {downloadable_text}")
-                else:
-                    update_progress("Summarizing downloadable material...")
-                    summaries['downloadable'] = summarize_text_with_ai(downloadable_text)
-                    if "Error" in (summaries['downloadable'] or ""): st.session_state.error_messages.append(f"Downloadable Material Summary: {summaries['downloadable']}")
-
-            full_context_for_prompts = get_combined_context(summaries['url'], summaries['additional'], summaries['downloadable'])
-            if "No context" in full_context_for_prompts and not (summaries['url'] or summaries['additional'] or summaries['downloadable']):
-                 st.session_state.error_messages.append("No usable context was extracted or summarized. Cannot generate ads effectively.")
-
-            # 2. Generate Ad Content
-            # Emails
-            for i in range(content_count):
-                update_progress(f"Generating Email content (Version {i+1}/{content_count})...")
-                prompt = create_email_prompt(full_context_for_prompts, lead_objective_choice, links_for_ads, i + 1)
-                response = generate_content_with_ai(prompt)
-                if isinstance(response, dict) and "error" not in response:
-                    all_ad_data['email'].append(response)
-                else: st.session_state.error_messages.append(f"Email Gen Error V{i+1}: {response.get('error', response) if isinstance(response, dict) else response}")
-
-
-            # LinkedIn & Facebook
-            social_platforms = {
-                "LinkedIn": {"objectives": ["Brand Awareness", "Demand Gen", "Demand Capture"], "key": "linkedin"},
-                "FaceBook": {"objectives": ["Brand Awareness", "Demand Gen", "Demand Capture"], "key": "facebook"}
-            }
-            cta_map = {
-                "LinkedIn": {"Brand Awareness": "Learn More", "Demand Gen": "Download", "Demand Capture": "Request Demo"},
-                "FaceBook": {"Brand Awareness": "Learn More", "Demand Gen": "Download", "Demand Capture": "Book Now"}
-            }
-
-            for platform_name, config in social_platforms.items():
-                for ad_obj in config["objectives"]:
-                    for i in range(content_count):
-                        update_progress(f"Generating {platform_name} {ad_obj} (V{i+1}/{content_count})...")
-                        prompt = create_linkedin_facebook_prompt(platform_name, full_context_for_prompts, lead_objective_choice, links_for_ads, ad_obj, i + 1)
-                        response = generate_content_with_ai(prompt)
-                        if isinstance(response, dict) and "error" not in response:
-                            if ad_obj == "Brand Awareness":
-                                response["destination_url"] = links_for_ads.get('learn_more', '#')
-                                response["cta_button"] = cta_map[platform_name][ad_obj]
-                            elif ad_obj == "Demand Gen":
-                                response["destination_url"] = links_for_ads.get('downloadable', '#')
-                                response["cta_button"] = cta_map[platform_name][ad_obj]
-                            elif ad_obj == "Demand Capture":
-                                response["destination_url"] = links_for_ads.get('objective_link', '#')
-                                response["cta_button"] = cta_map[platform_name][ad_obj]
-                            response["objective_type"] = ad_obj
-                            all_ad_data[config["key"]].append(response)
-                        else: st.session_state.error_messages.append(f"{platform_name} {ad_obj} V{i+1} Error: {response.get('error', response) if isinstance(response, dict) else response}")
-
-
-            # Google Search
-            update_progress("Generating Google Search ads...")
-            prompt = create_google_search_prompt(full_context_for_prompts, lead_objective_choice, links_for_ads)
-            response = generate_content_with_ai(prompt)
-            if isinstance(response, dict) and "error" not in response:
-                all_ad_data['google_search'] = response
-            else: st.session_state.error_messages.append(f"Google Search Ads Error: {response.get('error', response) if isinstance(response, dict) else response}")
-
-
-            # Google Display
-            update_progress("Generating Google Display ads...")
-            prompt = create_google_display_prompt(full_context_for_prompts, lead_objective_choice, links_for_ads)
-            response = generate_content_with_ai(prompt)
-            if isinstance(response, dict) and "error" not in response:
-                all_ad_data['google_display'] = response
-            else: st.session_state.error_messages.append(f"Google Display Ads Error: {response.get('error', response) if isinstance(response, dict) else response}")
-
-
-            # Reasoning Page Content
-            update_progress("Generating AI reasoning explanation...")
-            generated_counts = {
-                'email': len(all_ad_data['email']),
-                'linkedin_awareness': sum(1 for ad in all_ad_data['linkedin'] if ad.get("objective_type") == "Brand Awareness"),
-                'linkedin_demand_gen': sum(1 for ad in all_ad_data['linkedin'] if ad.get("objective_type") == "Demand Gen"),
-                'linkedin_demand_capture': sum(1 for ad in all_ad_data['linkedin'] if ad.get("objective_type") == "Demand Capture"),
-                'facebook_awareness': sum(1 for ad in all_ad_data['facebook'] if ad.get("objective_type") == "Brand Awareness"),
-                'facebook_demand_gen': sum(1 for ad in all_ad_data['facebook'] if ad.get("objective_type") == "Demand Gen"),
-                'facebook_demand_capture': sum(1 for ad in all_ad_data['facebook'] if ad.get("objective_type") == "Demand Capture"),
-            }
-            prompt = create_reasoning_prompt(summaries['url'], summaries['additional'], summaries['downloadable'], generated_counts)
-            ai_reasoning_text = generate_content_with_ai(prompt, expect_json=False)
-
-            all_ad_data['reasoning'] = {
-                'url_summary': summaries['url'] or "Not provided/extracted.",
-                'additional_summary': summaries['additional'] or "Not provided/extracted.",
-                'downloadable_summary': summaries['downloadable'] or "Not provided/extracted.",
-                'ai_reasoning': ai_reasoning_text if not (isinstance(ai_reasoning_text, str) and "Error" in ai_reasoning_text) else "Could not generate AI reasoning."
-            }
-            if isinstance(ai_reasoning_text, str) and "Error" in ai_reasoning_text: st.session_state.error_messages.append(f"AI Reasoning Error: {ai_reasoning_text}")
-
-
-            # 3. Create Excel Report
-            has_data = any(all_ad_data[key] for key in ['email', 'linkedin', 'facebook', 'google_search', 'google_display'])
-
-            if has_data:
-                update_progress("Creating Excel report...")
-                company_name_for_file = get_company_name_from_url(client_url)
-                excel_bytes, excel_filename = create_excel_report(all_ad_data, company_name_for_file, lead_objective_choice)
+                    excel_bytes, excel_filename = create_zip_archive(
+                        [(report_bytes, report_filename) for _, report_bytes, report_filename in st.session_state.reports],
+                        get_company_name_from_url(client_url)
+                    )
 
                 st.session_state.excel_bytes = excel_bytes
                 st.session_state.excel_filename = excel_filename
@@ -289,6 +306,10 @@ with col2:
             # import traceback
             # st.error(traceback.format_exc())
         finally:
+            if profiler and profiler.stages:
+                profile_bytes, profile_filename = profiler.build_archive(get_company_name_from_url(client_url))
+                st.session_state.profile_bytes = profile_bytes
+                st.session_state.profile_filename = profile_filename
             progress_bar.progress(1.0)
             # Rerun to update the UI based on session state changes
             st.rerun() # CORRECTED: Use st.rerun()
\ No newline at end of file
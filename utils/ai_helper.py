@@ -1,21 +1,228 @@
 # utils/ai_helper.py
-import openai
 import json
+import os
 import streamlit as st
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.profiler import follow_stage
 
 # Use the model name provided by the user
 AI_MODEL = "gpt-4.1-mini" 
 # For development, if "gpt-4.1-mini" is not available via standard API, 
 # you might use "gpt-4-turbo-preview" or "gpt-3.5-turbo"
 # AI_MODEL = "gpt-4-turbo-preview" 
+FAST_MODEL = "gpt-4.1-nano" # Short-form copy: headlines, social posts
+
+# Model and temperature per task type. If the primary model's recent p95 latency
+# for that task exceeds max_p95_seconds, or its error rate exceeds MAX_ERROR_RATE,
+# calls are routed to the fallback model until the primary's stats age out.
+# Fallbacks are never slower than the primary, so a latency breach can't get worse.
+# timeout_seconds is a per-attempt deadline; hedge allows a duplicate request
+# once a call runs past the task's observed p95 (off for long, costly prompts).
+# sdk_max_retries lets the SDK retry 429/5xx/connection errors itself; it stays on
+# for summarize, which has no retry loop of its own, and off for generation tasks,
+# which retry in generate_content_with_ai.
+MODEL_ROUTES = {
+    "summarize": {"model": AI_MODEL, "temperature": 0.3, "fallback": FAST_MODEL, "max_p95_seconds": 120, "timeout_seconds": 240, "hedge": False, "sdk_max_retries": 2},
+    "email": {"model": AI_MODEL, "temperature": 0.7, "fallback": FAST_MODEL, "max_p95_seconds": 45, "timeout_seconds": 90, "hedge": True},
+    "social": {"model": FAST_MODEL, "temperature": 0.7, "fallback": AI_MODEL, "max_p95_seconds": 20, "timeout_seconds": 45, "hedge": True},
+    "search": {"model": FAST_MODEL, "temperature": 0.7, "fallback": AI_MODEL, "max_p95_seconds": 20, "timeout_seconds": 45, "hedge": True},
+    "display": {"model": FAST_MODEL, "temperature": 0.7, "fallback": AI_MODEL, "max_p95_seconds": 20, "timeout_seconds": 45, "hedge": True},
+    "reasoning": {"model": AI_MODEL, "temperature": 0.7, "fallback": FAST_MODEL, "max_p95_seconds": 60, "timeout_seconds": 120, "hedge": True},
+}
+DEFAULT_TASK = "email"
+GENERATION_SYSTEM_PROMPT = "You are a creative marketing and advertising expert AI."
+MAX_ERROR_RATE = 0.25
+MODEL_HEALTH_WINDOW = 50 # Most recent calls kept per (task, model)
+MODEL_HEALTH_MIN_SAMPLES = 5 # Don't judge a model on fewer calls than this
+MODEL_HEALTH_TTL_SECONDS = 300 # Older samples are dropped so a demoted model gets retried
+
+HEDGING_ENABLED = True
+HEDGE_MAX_RATE = 0.1 # At most this fraction of requests may send a duplicate
+HEDGE_MIN_SAMPLES = 20 # Successful calls per task needed before its p95 is trusted
+HEDGE_MIN_DELAY_SECONDS = 2.0
+
+# (task, model) -> deque of (timestamp, latency_seconds, succeeded). Keyed by task
+# too, so long summarize calls don't count against a short task's latency budget.
+# Module state survives Streamlit reruns, so routing carries over between runs.
+_model_stats = {}
+_model_stats_lock = threading.Lock()
+# task -> deque of successful call latencies, used as the hedging trigger.
+_task_latencies = {}
+_hedge_counts = {"requests": 0, "hedges": 0}
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="ai-request")
+
+def record_model_call(task, model, latency_seconds, succeeded):
+    """Records the outcome of one API call for latency-aware routing."""
+    with _model_stats_lock:
+        samples = _model_stats.setdefault((task, model), deque(maxlen=MODEL_HEALTH_WINDOW))
+        samples.append((time.monotonic(), latency_seconds, succeeded))
+
+def get_model_health(task, model):
+    """Returns {"samples", "p95_latency", "error_rate"} over the model's recent calls for a task."""
+    cutoff = time.monotonic() - MODEL_HEALTH_TTL_SECONDS
+    with _model_stats_lock:
+        samples = _model_stats.get((task, model), deque())
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        recent = list(samples)
+    if not recent:
+        return {"samples": 0, "p95_latency": None, "error_rate": 0.0}
+    failures = sum(1 for _, _, succeeded in recent if not succeeded)
+    return {"samples": len(recent), "p95_latency": _p95(latency for _, latency, _ in recent), "error_rate": failures / len(recent)}
+
+def _p95(values):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+
+def get_task_p95_latency(task):
+    """Returns the p95 latency of recent successful calls for a task, or None if too few."""
+    with _model_stats_lock:
+        latencies = list(_task_latencies.get(task, ()))
+    if len(latencies) < HEDGE_MIN_SAMPLES:
+        return None
+    return _p95(latencies)
+
+def get_hedge_stats():
+    """Returns {"requests", "hedges"} counted since the process started."""
+    with _model_stats_lock:
+        return dict(_hedge_counts)
+
+def _is_model_healthy(task, model, max_p95_seconds):
+    health = get_model_health(task, model)
+    if health["samples"] < MODEL_HEALTH_MIN_SAMPLES:
+        return True
+    return health["p95_latency"] <= max_p95_seconds and health["error_rate"] <= MAX_ERROR_RATE
+
+def select_model(task):
+    """Returns (model, temperature) for a task type, falling back if the primary is degraded."""
+    if task not in MODEL_ROUTES:
+        raise ValueError(f"Unknown AI task type '{task}'. Expected one of: {', '.join(MODEL_ROUTES)}.")
+    route = MODEL_ROUTES[task]
+    model = route["model"]
+    fallback = route.get("fallback")
+    budget = route["max_p95_seconds"]
+    if fallback and not _is_model_healthy(task, model, budget) and _is_model_healthy(task, fallback, budget):
+        model = fallback
+    return model, route["temperature"]
+
+def _create_chat_completion(client, model, temperature, messages, task, timeout=None, max_retries=0):
+    """Calls the chat completions API and records the latency and outcome for routing."""
+    if timeout is not None:
+        client = client.with_options(timeout=timeout, max_retries=max_retries)
+    start = time.monotonic()
+    try:
+        response = client.chat.completions.create(model=model, messages=messages, temperature=temperature)
+    except Exception:
+        record_model_call(task, model, time.monotonic() - start, False)
+        raise
+    latency = time.monotonic() - start
+    record_model_call(task, model, latency, True)
+    with _model_stats_lock:
+        _task_latencies.setdefault(task, deque(maxlen=MODEL_HEALTH_WINDOW)).append(latency)
+    return response
+
+def _reserve_hedge():
+    """Counts a hedge if doing so keeps hedges within HEDGE_MAX_RATE of all requests."""
+    with _model_stats_lock:
+        if _hedge_counts["hedges"] + 1 > HEDGE_MAX_RATE * _hedge_counts["requests"]:
+            return False
+        _hedge_counts["hedges"] += 1
+        return True
+
+def _request_content(client, task, messages, is_valid=None):
+    """
+    Runs one request for `task` under its deadline and returns the response text.
+    If hedging is on and the call outlives the task's observed p95 latency, a
+    duplicate is sent and the first valid response wins; the slower call is left
+    to finish (or hit its deadline) in the background.
+    """
+    route = MODEL_ROUTES[task]
+    with _model_stats_lock:
+        _hedge_counts["requests"] += 1
+
+    def call():
+        model, temperature = select_model(task)
+        response = _create_chat_completion(
+            client, model, temperature, messages, task=task,
+            timeout=route["timeout_seconds"], max_retries=route.get("sdk_max_retries", 0)
+        )
+        return response.choices[0].message.content.strip()
+
+    hedge_delay = get_task_p95_latency(task) if HEDGING_ENABLED and route["hedge"] else None
+    if hedge_delay is None:
+        return call()
+
+    call = follow_stage(call) # Profiles the worker-thread calls into the caller's stage, if any
+    futures = {_hedge_executor.submit(call)}
+    done, _ = wait(futures, timeout=max(hedge_delay, HEDGE_MIN_DELAY_SECONDS))
+    if not done and _reserve_hedge():
+        futures.add(_hedge_executor.submit(call))
+
+    invalid_content, last_error = None, None
+    while futures:
+        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                content = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            if is_valid is None or is_valid(content):
+                return content
+            invalid_content = content
+    if invalid_content is not None:
+        return invalid_content
+    raise last_error
+
+def extract_json_object(content):
+    """Returns the outermost JSON object embedded in a model response, or None."""
+    json_start = content.find('{')
+    json_end = content.rfind('}') + 1
+    if json_start == -1 or json_end == 0:
+        return None
+    try:
+        return json.loads(content[json_start:json_end])
+    except json.JSONDecodeError:
+        return None
+
+def _has_json_object(content):
+    return extract_json_object(content) is not None
+
+def build_generation_messages(prompt_text):
+    """Chat messages for a generation prompt; shared with the batch runner."""
+    return [
+        {"role": "system", "content": GENERATION_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt_text}
+    ]
+
+@st.cache_resource(show_spinner=False)
+def _create_openai_client(api_key):
+    """Builds one OpenAI client per API key and keeps it across script reruns."""
+    import openai  # Deferred: the SDK is slow to import and only needed for generation.
+    return openai.OpenAI(api_key=api_key)
+
+def get_openai_api_key():
+    """
+    The OpenAI API key from the OPENAI_API_KEY environment variable (so
+    command-line tools run without a secrets.toml), else from st.secrets, else None.
+    """
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if api_key:
+        return api_key
+    try:
+        return st.secrets.get("OPENAI_API_KEY")
+    except FileNotFoundError: # No secrets.toml at all (StreamlitSecretNotFoundError)
+        return None
 
 def get_openai_client():
-    api_key = st.secrets.get("OPENAI_API_KEY")
+    api_key = get_openai_api_key()
     if not api_key:
-        st.error("OpenAI API key not found. Please set it in secrets.toml.")
+        st.error("OpenAI API key not found. Set OPENAI_API_KEY or add it to secrets.toml.")
         return None
-    return openai.OpenAI(api_key=api_key)
+    return _create_openai_client(api_key)
 
 def summarize_text_with_ai(text_content, purpose="marketing ad copy generation"):
     """Summarizes text using OpenAI, ensuring full context is considered."""
@@ -40,22 +247,23 @@ def summarize_text_with_ai(text_content, purpose="marketing ad copy generation")
     Comprehensive Summary:
     """
     try:
-        response = client.chat.completions.create(
-            model=AI_MODEL,
+        summary = _request_content(
+            client, "summarize",
             messages=[
                 {"role": "system", "content": "You are a highly skilled summarization assistant."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.3,
         )
-        summary = response.choices[0].message.content.strip()
         return summary
     except Exception as e:
         st.error(f"OpenAI API error during summarization: {e}")
         return f"Error during summarization: {e}"
 
-def generate_content_with_ai(prompt_text, expect_json=True):
-    """Generates content using OpenAI, optionally parsing JSON."""
+def generate_content_with_ai(prompt_text, expect_json=True, task=DEFAULT_TASK):
+    """
+    Generates content using OpenAI, optionally parsing JSON.
+    `task` selects the model and temperature from MODEL_ROUTES.
+    """
     client = get_openai_client()
     if not client:
         return "Error: OpenAI client not initialized."
@@ -63,38 +271,24 @@ def generate_content_with_ai(prompt_text, expect_json=True):
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = client.chat.completions.create(
-                model=AI_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are a creative marketing and advertising expert AI."},
-                    {"role": "user", "content": prompt_text}
-                ],
-                temperature=0.7, # Higher for creative tasks
+            # The model is re-selected on every attempt so a failing primary hands over to its fallback.
+            content = _request_content(
+                client, task,
+                messages=build_generation_messages(prompt_text),
                 # response_format={ "type": "json_object" } if expect_json and model supports it well
+                is_valid=_has_json_object if expect_json else None,
             )
-            content = response.choices[0].message.content.strip()
             
             if expect_json:
-                # Try to find JSON within the content if it's not perfectly formatted
-                # This is a common issue with LLMs.
-                json_start = content.find('{')
-                json_end = content.rfind('}') + 1
-                if json_start != -1 and json_end != 0:
-                    json_str = content[json_start:json_end]
-                    try:
-                        return json.loads(json_str)
-                    except json.JSONDecodeError as je:
-                        if attempt < max_retries - 1:
-                            time.sleep(2) # Wait before retrying
-                            continue
-                        st.warning(f"Failed to parse JSON after multiple attempts. Raw content: {content}. Error: {je}")
-                        return {"error": "Failed to parse JSON response", "raw_content": content}
-                else: # No JSON found
-                    if attempt < max_retries - 1:
-                        time.sleep(2)
-                        continue
-                    st.warning(f"No JSON object found in response after multiple attempts. Raw content: {content}")
-                    return {"error": "No JSON object found in response", "raw_content": content}
+                # LLMs often wrap the JSON in prose or code fences, so pull out the object.
+                parsed = extract_json_object(content)
+                if parsed is not None:
+                    return parsed
+                if attempt < max_retries - 1:
+                    time.sleep(2) # Wait before retrying
+                    continue
+                st.warning(f"No valid JSON object found in response after multiple attempts. Raw content: {content}")
+                return {"error": "No JSON object found in response", "raw_content": content}
 
             return content # Return as text if not expecting JSON
         except Exception as e:
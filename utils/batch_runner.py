@@ -0,0 +1,394 @@
+# utils/batch_runner.py
+"""
+Offline bulk mode: every generation prompt for a manifest of campaigns is
+written to one JSONL batch file, submitted to a batch endpoint, polled until
+done, and the results are mapped back into all_ad_data for create_excel_report.
+
+Usage (from the repository root):
+    python -m utils.batch_runner manifest.json --out bulk_output
+    python -m utils.batch_runner manifest.json --out bulk_output --backend local --placeholder
+
+The manifest is a JSON list of campaigns (or {"campaigns": [...]}), e.g.:
+    [{"client_url": "example.com",
+      "lead_objectives": ["Demo Booking", "Sales Meeting"],
+      "content_count": 3,
+      "links": {"learn_more": "...", "downloadable": "..."},
+      "objective_links": {"Demo Booking": "...", "Sales Meeting": "..."},
+      "additional_context_file": "decks/example.pdf",
+      "max_pages": 5}]
+A campaign may also provide "summaries" ({"url", "additional", "downloadable"})
+to skip extraction and summarization, which is how the local stand-in runs
+without network access.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import uuid
+
+from utils.ai_helper import select_model, build_generation_messages, extract_json_object, get_openai_client
+from utils.campaign import (
+    build_campaign_context, build_generation_jobs, apply_generation_result,
+    repair_ad_data, add_reasoning, new_ad_data, has_ad_content, count_generated_ads,
+    get_company_name_from_url, DEFAULT_AD_LINKS, DEFAULT_OBJECTIVE_LINKS, PLATFORM_TASKS
+)
+from utils.content_validator import LIST_CONSTRAINTS
+from utils.prompt_builder import get_combined_context, create_reasoning_prompt
+from utils.excel_writer import create_excel_report
+from utils.text_extractor import DEFAULT_MAX_PAGES
+from urllib.parse import urlparse
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+class OpenAIBatchBackend:
+    """Submits batch files to the OpenAI Batch API."""
+
+    def __init__(self, client=None):
+        self.client = client or get_openai_client()
+        if self.client is None:
+            raise ValueError("OpenAI API key not found. Set OPENAI_API_KEY or add it to secrets.toml.")
+
+    def submit(self, batch_file_path):
+        with open(batch_file_path, "rb") as batch_file:
+            uploaded = self.client.files.create(file=batch_file, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT, completion_window=BATCH_COMPLETION_WINDOW
+        )
+        return batch.id
+
+    def status(self, batch_id):
+        return self.client.batches.retrieve(batch_id).status
+
+    def fetch_results(self, batch_id):
+        """Returns the output and error lines; expired batches may still have partial output."""
+        batch = self.client.batches.retrieve(batch_id)
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                content = self.client.files.content(file_id).text
+                lines.extend(json.loads(line) for line in content.splitlines() if line.strip())
+        return lines
+
+class LocalBatchBackend:
+    """
+    File-based stand-in for the batch endpoint. submit() copies the batch file
+    to <work_dir>/<batch_id>/input.jsonl; the batch is complete once an
+    output.jsonl in the provider's output format appears next to it. With a
+    `responder(custom_id, body) -> content` the output is written immediately;
+    without one, an operator or test drops output.jsonl in by hand.
+    """
+
+    def __init__(self, work_dir, responder=None):
+        self.work_dir = work_dir
+        self.responder = responder
+
+    def _batch_dir(self, batch_id):
+        return os.path.join(self.work_dir, batch_id)
+
+    def submit(self, batch_file_path):
+        batch_id = f"local_batch_{uuid.uuid4().hex[:12]}"
+        batch_dir = self._batch_dir(batch_id)
+        os.makedirs(batch_dir)
+        shutil.copyfile(batch_file_path, os.path.join(batch_dir, "input.jsonl"))
+        if self.responder:
+            self._respond(batch_dir)
+        return batch_id
+
+    def _respond(self, batch_dir):
+        output_path = os.path.join(batch_dir, "output.jsonl")
+        with open(os.path.join(batch_dir, "input.jsonl"), encoding="utf-8") as input_file, \
+                open(f"{output_path}.tmp", "w", encoding="utf-8") as output_file:
+            for line in input_file:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                content = self.responder(request["custom_id"], request["body"])
+                output_file.write(json.dumps({
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": {"choices": [{"message": {"role": "assistant", "content": content}}]}},
+                    "error": None,
+                }) + "\n")
+        os.replace(f"{output_path}.tmp", output_path)
+
+    def status(self, batch_id):
+        if os.path.exists(os.path.join(self._batch_dir(batch_id), "output.jsonl")):
+            return "completed"
+        return "in_progress"
+
+    def fetch_results(self, batch_id):
+        with open(os.path.join(self._batch_dir(batch_id), "output.jsonl"), encoding="utf-8") as output_file:
+            return [json.loads(line) for line in output_file if line.strip()]
+
+def _placeholder_text(label, *parts):
+    """Short copy that is unique per request and field, so versions never read as near-duplicates."""
+    token = hashlib.sha256(":".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:12]
+    return f"{label} {token}"
+
+def placeholder_responder(custom_id, body):
+    """
+    Canned responses for LocalBatchBackend that pass content_validator, so an
+    offline --repair run never needs a live repair call. The task is the last
+    part of the custom_id; Google jobs get exactly the counts LIST_CONSTRAINTS asks for.
+    """
+    task = custom_id.rsplit(":", 1)[-1]
+    if task == "reasoning":
+        return "Placeholder reasoning from the local batch stand-in."
+    list_keys = [key for key in LIST_CONSTRAINTS if PLATFORM_TASKS[key] == task]
+    if list_keys:
+        return json.dumps({
+            field: [_placeholder_text(field.rstrip("s").title(), custom_id, field, i) for i in range(constraint['count'])]
+            for field, constraint in LIST_CONSTRAINTS[list_keys[0]].items()
+        })
+    fields = {
+        "headline": "Headline", "subject_line": "Subject", "body": "Body", "ad_name": "Ad",
+        "introductory_text": "Intro", "primary_text": "Primary", "image_copy": "Image", "link_description": "Link",
+    }
+    response = {field: _placeholder_text(label, custom_id, field) for field, label in fields.items()}
+    response["cta"] = "Book Now"
+    return json.dumps(response)
+
+def load_manifest(path):
+    with open(path, encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    campaigns = manifest.get("campaigns", []) if isinstance(manifest, dict) else manifest
+    if not campaigns:
+        raise ValueError(f"Manifest '{path}' does not list any campaigns.")
+    for position, entry in enumerate(campaigns, start=1):
+        if not entry.get("client_url"):
+            raise ValueError(f"Manifest campaign #{position} is missing 'client_url'.")
+    return campaigns
+
+def _open_upload(path):
+    # A plain file object works with extract_text_from_file: it has .name, and
+    # large files are memory-mapped rather than read into memory.
+    return open(path, "rb") if path else None
+
+def build_campaign_context_for_entry(entry, log=print):
+    """Runs (or skips, if "summaries" is given) the context phase for one manifest entry."""
+    if entry.get("summaries"):
+        summaries = {key: entry["summaries"].get(key) for key in ('url', 'additional', 'downloadable')}
+        return summaries, get_combined_context(summaries['url'], summaries['additional'], summaries['downloadable']), []
+
+    additional_file = _open_upload(entry.get("additional_context_file"))
+    downloadable_file = _open_upload(entry.get("downloadable_material_file"))
+    try:
+        return build_campaign_context(
+            entry["client_url"], additional_file, downloadable_file, progress=log,
+            max_pages=entry.get("max_pages", DEFAULT_MAX_PAGES), use_site_cache=entry.get("use_site_cache", True)
+        )
+    finally:
+        for upload in (additional_file, downloadable_file):
+            if upload:
+                upload.close()
+
+def plan_campaigns(manifest_entries, log=print):
+    """
+    Builds the context once per manifest entry and lists the generation jobs for
+    each of its lead objectives. Returns one plan dict per (entry, objective).
+    """
+    plans = []
+    for entry in manifest_entries:
+        log(f"Building context for {entry['client_url']}...")
+        summaries, full_context, context_errors = build_campaign_context_for_entry(entry, log)
+        lead_objectives = entry.get("lead_objectives") or [entry.get("lead_objective", "Demo Booking")]
+        content_count = int(entry.get("content_count", 1))
+        for lead_objective in lead_objectives:
+            links = {**DEFAULT_AD_LINKS, **entry.get("links", {})}
+            links['objective_link'] = entry.get("objective_links", {}).get(
+                lead_objective, links.get('objective_link', DEFAULT_OBJECTIVE_LINKS.get(lead_objective, '#'))
+            )
+            plans.append({
+                "client_url": entry["client_url"],
+                "lead_objective": lead_objective,
+                "links": links,
+                "content_count": content_count,
+                "summaries": summaries,
+                "full_context": full_context,
+                "errors": list(context_errors),
+                "jobs": build_generation_jobs(full_context, lead_objective, links, content_count),
+            })
+    return plans
+
+def _planned_ad_counts(plan):
+    """Ad counts for the reasoning prompt, assuming every batched request succeeds."""
+    planned = new_ad_data()
+    for job in plan["jobs"]:
+        if isinstance(planned[job["key"]], list):
+            planned[job["key"]].append({"objective_type": job.get("ad_objective")})
+    return count_generated_ads(planned)
+
+def _batch_line(custom_id, task, prompt_text):
+    model, temperature = select_model(task)
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {"model": model, "temperature": temperature, "messages": build_generation_messages(prompt_text)},
+    }
+
+def _job_custom_id(plan_index, job_index, job):
+    return f"{plan_index}:{job_index}:{job['task']}"
+
+def write_batch_file(plans, path):
+    """
+    Writes every generation and reasoning prompt as one JSONL batch file.
+    custom_id is "<plan index>:<job index>:<task>", or "<plan index>:reasoning".
+    Returns the number of requests written.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as batch_file:
+        for plan_index, plan in enumerate(plans):
+            for job_index, job in enumerate(plan["jobs"]):
+                batch_file.write(json.dumps(_batch_line(_job_custom_id(plan_index, job_index, job), job["task"], job["prompt"])) + "\n")
+                count += 1
+            summaries = plan["summaries"]
+            reasoning_prompt = create_reasoning_prompt(summaries['url'], summaries['additional'], summaries['downloadable'], _planned_ad_counts(plan))
+            batch_file.write(json.dumps(_batch_line(f"{plan_index}:reasoning", "reasoning", reasoning_prompt)) + "\n")
+            count += 1
+    return count
+
+def wait_for_batch(backend, batch_id, poll_seconds=60, timeout_seconds=None, log=print):
+    """Polls until the batch reaches a terminal status and returns that status."""
+    started = time.monotonic()
+    while True:
+        status = backend.status(batch_id)
+        if status in TERMINAL_STATUSES:
+            return status
+        if timeout_seconds is not None and time.monotonic() - started > timeout_seconds:
+            raise TimeoutError(f"Batch {batch_id} still '{status}' after {timeout_seconds} seconds.")
+        log(f"Batch {batch_id} is {status}; checking again in {poll_seconds}s...")
+        time.sleep(poll_seconds)
+
+def parse_batch_results(result_lines):
+    """Maps custom_id -> response content, or -> {"error": ...} for failed requests."""
+    results = {}
+    for line in result_lines:
+        response = line.get("response") or {}
+        body = response.get("body") or {}
+        if line.get("error") or response.get("status_code") != 200:
+            error = line.get("error") or body.get("error") or f"HTTP {response.get('status_code')}"
+            results[line["custom_id"]] = {"error": f"Batch request failed: {error}"}
+            continue
+        try:
+            results[line["custom_id"]] = body["choices"][0]["message"]["content"].strip()
+        except (KeyError, IndexError, TypeError, AttributeError):
+            results[line["custom_id"]] = {"error": "Batch response had no message content."}
+    return results
+
+def _as_generation_response(content):
+    """Shapes batch content like generate_content_with_ai(expect_json=True) does."""
+    if isinstance(content, dict):
+        return content
+    parsed = extract_json_object(content)
+    if parsed is None:
+        return {"error": "No JSON object found in response", "raw_content": content}
+    return parsed
+
+def map_results_to_ad_data(plan_index, plan, results, repair=False):
+    """Builds all_ad_data for one plan from batch results; returns (all_ad_data, errors)."""
+    errors = plan["errors"]
+    all_ad_data = new_ad_data()
+    for job_index, job in enumerate(plan["jobs"]):
+        content = results.get(_job_custom_id(plan_index, job_index, job), {"error": "Missing from batch output."})
+        apply_generation_result(all_ad_data, job, _as_generation_response(content), plan["links"], errors)
+
+    if repair:
+        # Repairs are few (one per platform at most), so they go through the interactive API.
+        repair_ad_data(all_ad_data, plan["full_context"], errors)
+
+    reasoning = results.get(f"{plan_index}:reasoning", "Error: Missing from batch output.")
+    if isinstance(reasoning, dict):
+        reasoning = f"Error: {reasoning.get('error')}"
+    add_reasoning(all_ad_data, plan["summaries"], reasoning, errors)
+    return all_ad_data, errors
+
+def _unique_report_filename(excel_filename, client_url, plan_index, used_filenames):
+    """
+    Keeps create_excel_report's name unless an earlier report in this run already
+    took it (e.g. acme.com and acme.io), then falls back to the full host and
+    finally to the plan index.
+    """
+    if excel_filename not in used_filenames:
+        return excel_filename
+    url = client_url if client_url.startswith(('http://', 'https://')) else 'https://' + client_url
+    host = re.sub(r"[^a-z0-9]+", "_", urlparse(url).netloc.lower().replace("www.", "")).strip("_") or "site"
+    objective_part = excel_filename.split("_", 1)[1] if "_" in excel_filename else excel_filename
+    candidate = f"{host}_{objective_part}"
+    if candidate not in used_filenames:
+        return candidate
+    return f"{host}_{plan_index + 1:02d}_{objective_part}"
+
+def run_bulk(manifest_entries, backend, output_dir, poll_seconds=60, timeout_seconds=None, repair=False, log=print):
+    """
+    Runs the whole bulk pipeline and writes one Excel report per campaign objective
+    plus bulk_summary.json into `output_dir`. Returns the summary dict.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    plans = plan_campaigns(manifest_entries, log)
+
+    batch_path = os.path.join(output_dir, "batch_input.jsonl")
+    request_count = write_batch_file(plans, batch_path)
+    log(f"Wrote {request_count} requests for {len(plans)} campaign objective(s) to {batch_path}.")
+
+    batch_id = backend.submit(batch_path)
+    log(f"Submitted batch {batch_id}.")
+    status = wait_for_batch(backend, batch_id, poll_seconds, timeout_seconds, log)
+    log(f"Batch {batch_id} finished with status '{status}'.")
+    results = parse_batch_results(backend.fetch_results(batch_id)) if status in ("completed", "expired") else {}
+
+    summary = {"batch_id": batch_id, "status": status, "requests": request_count, "reports": []}
+    used_filenames = set()
+    for plan_index, plan in enumerate(plans):
+        all_ad_data, errors = map_results_to_ad_data(plan_index, plan, results, repair)
+        report = {"client_url": plan["client_url"], "lead_objective": plan["lead_objective"], "file": None, "errors": errors}
+        if has_ad_content(all_ad_data):
+            excel_bytes, excel_filename = create_excel_report(all_ad_data, get_company_name_from_url(plan["client_url"]), plan["lead_objective"])
+            excel_filename = _unique_report_filename(excel_filename, plan["client_url"], plan_index, used_filenames)
+            used_filenames.add(excel_filename)
+            with open(os.path.join(output_dir, excel_filename), "wb") as report_file:
+                report_file.write(excel_bytes.getvalue())
+            report["file"] = excel_filename
+            log(f"Wrote {excel_filename} ({len(errors)} issue(s)).")
+        else:
+            errors.append("No content to create Excel report.")
+            log(f"No report for {plan['client_url']} / {plan['lead_objective']}: no content.")
+        summary["reports"].append(report)
+
+    with open(os.path.join(output_dir, "bulk_summary.json"), "w", encoding="utf-8") as summary_file:
+        json.dump(summary, summary_file, indent=2)
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="Path to the campaign manifest (JSON).")
+    parser.add_argument("--out", default="bulk_output", help="Directory for the batch file, reports and summary.")
+    parser.add_argument("--backend", choices=["openai", "local"], default="openai")
+    parser.add_argument("--local-dir", default=".batch_local", help="Work directory for the local stand-in backend.")
+    parser.add_argument("--placeholder", action="store_true", help="Local backend: answer every request with canned content.")
+    parser.add_argument("--poll-seconds", type=float, default=60)
+    parser.add_argument("--timeout-seconds", type=float, default=None, help="Give up waiting after this long (default: wait).")
+    parser.add_argument("--repair", action="store_true", help="Fix constraint violations with interactive API calls.")
+    args = parser.parse_args(argv)
+
+    try:
+        manifest_entries = load_manifest(args.manifest)
+        if args.backend == "local":
+            backend = LocalBatchBackend(args.local_dir, placeholder_responder if args.placeholder else None)
+        else:
+            backend = OpenAIBatchBackend()
+        summary = run_bulk(manifest_entries, backend, args.out, args.poll_seconds, args.timeout_seconds, args.repair)
+    except (OSError, ValueError, TimeoutError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    written = sum(1 for report in summary["reports"] if report["file"])
+    print(f"Done: {written}/{len(summary['reports'])} report(s) written to {args.out}.")
+    return 0 if written else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+# utils/campaign.py
+# Pipeline shared by single- and multi-objective runs: the context phase
+# (extract + summarize) runs once, and the generation phase runs per lead objective.
+# Errors are collected into lists rather than session state so the generation
+# phase can run in worker threads.
+from utils.text_extractor import extract_pages_from_site, extract_text_from_file, get_upload_size, DEFAULT_MAX_PAGES
+from utils.ai_helper import summarize_text_with_ai, generate_content_with_ai
+from utils.site_summary import summarize_site_pages
+from utils.prompt_builder import (
+    get_combined_context, create_email_prompt,
+    create_linkedin_facebook_prompt, create_google_search_prompt,
+    create_google_display_prompt, create_reasoning_prompt, create_repair_prompt
+)
+from utils.content_validator import validate_ad_data, apply_repairs
+from utils.profiler import profile_stage
+from urllib.parse import urlparse
+
+SOCIAL_PLATFORMS = {
+    "LinkedIn": {"objectives": ["Brand Awareness", "Demand Gen", "Demand Capture"], "key": "linkedin"},
+    "FaceBook": {"objectives": ["Brand Awareness", "Demand Gen", "Demand Capture"], "key": "facebook"}
+}
+CTA_MAP = {
+    "LinkedIn": {"Brand Awareness": "Learn More", "Demand Gen": "Download", "Demand Capture": "Request Demo"},
+    "FaceBook": {"Brand Awareness": "Learn More", "Demand Gen": "Download", "Demand Capture": "Book Now"}
+}
+# Link defaults shared by the app's sidebar and the bulk runner's manifest entries.
+DEFAULT_AD_LINKS = {'learn_more': "https://example.com/learn-more", 'downloadable': "https://example.com/whitepaper-download"}
+DEFAULT_OBJECTIVE_LINKS = {"Demo Booking": "https://example.com/book-demo", "Sales Meeting": "https://example.com/contact-sales"}
+DESTINATION_LINK_KEYS = {"Brand Awareness": 'learn_more', "Demand Gen": 'downloadable', "Demand Capture": 'objective_link'}
+PLATFORM_LABELS = {
+    'email': "Email", 'linkedin': "LinkedIn", 'facebook': "FaceBook",
+    'google_search': "Google Search", 'google_display': "Google Display"
+}
+PLATFORM_TASKS = {
+    'email': "email", 'linkedin': "social", 'facebook': "social",
+    'google_search': "search", 'google_display': "display"
+}
+
+def get_company_name_from_url(url):
+    if not url:
+        return "brand"
+    try:
+        if not url.startswith(('http://', 'https://')):
+            url = 'https://' + url
+        parsed_url = urlparse(url)
+        domain_parts = parsed_url.netloc.split('.')
+        if len(domain_parts) > 2 and domain_parts[-2] not in ['co', 'com', 'org', 'net', 'gov', 'edu']:
+            return domain_parts[-2]
+        elif len(domain_parts) > 1:
+             return domain_parts[-2] if len(domain_parts) > 2 else domain_parts[0]
+        return domain_parts[0] if domain_parts else "brand"
+    except Exception:
+        return "brand"
+
+def _no_progress(message):
+    pass
+
+RAW_CONTENT_ERROR_CHARS = 500
+
+def _error_text(response):
+    """
+    The error message of a failed response. Unparseable replies keep their raw
+    content, since warnings raised on a worker thread never reach the page.
+    """
+    if not isinstance(response, dict):
+        return response
+    error = response.get('error', response)
+    raw_content = response.get('raw_content')
+    if raw_content:
+        if len(raw_content) > RAW_CONTENT_ERROR_CHARS:
+            raw_content = raw_content[:RAW_CONTENT_ERROR_CHARS] + "..."
+        error = f"{error}. Raw content: {raw_content}"
+    return error
+
+def _is_cancelled(cancel_event):
+    return cancel_event is not None and cancel_event.is_set()
+
+def count_context_steps():
+    return 5
+
+def count_generation_steps(content_count):
+    """Progress steps taken by generate_campaign for one lead objective."""
+    steps = content_count # Emails
+    steps += 2 * 3 * content_count # LinkedIn & FaceBook, three objectives each
+    steps += 2 # Google Search & Display
+    steps += 1 + len(PLATFORM_LABELS) # Constraint check + at most one repair call per platform
+    steps += 1 # Reasoning
+    return steps
+
+def _upload_details(uploaded_file):
+    return {"filename": uploaded_file.name, "size_bytes": get_upload_size(uploaded_file)}
+
+def build_campaign_context(client_url, additional_context_file=None, downloadable_material_file=None, progress=_no_progress, profiler=None,
+                           max_pages=DEFAULT_MAX_PAGES, use_site_cache=True):
+    """
+    Extracts and summarizes the website (up to `max_pages` pages) and uploaded materials.
+    With `use_site_cache`, only website pages that changed since the last run are
+    re-summarized. Returns (summaries, full_context, errors). Pass a StageProfiler
+    as `profiler` to profile each extraction and summarization separately.
+    """
+    errors = []
+    summaries = {'url': None, 'additional': None, 'downloadable': None}
+
+    progress("Extracting website content...")
+    with profile_stage(profiler, "extract_url", url=client_url, max_pages=max_pages):
+        site_pages = extract_pages_from_site(client_url, max_pages)
+    if isinstance(site_pages, str):
+        errors.append(f"URL Text Extraction: {site_pages}")
+    elif not site_pages:
+        errors.append("URL Text Extraction: No text found on the website.")
+    else:
+        progress(f"Summarizing website content ({len(site_pages)} page(s))...")
+        with profile_stage(profiler, "summarize_url", pages=len(site_pages), text_chars=sum(len(t) for t in site_pages.values())):
+            summaries['url'], _ = summarize_site_pages(client_url, site_pages, use_cache=use_site_cache)
+        if "Error" in (summaries['url'] or ""): errors.append(f"URL Summary: {summaries['url']}")
+
+    if additional_context_file:
+        progress("Extracting additional context...")
+        with profile_stage(profiler, "extract_additional", **_upload_details(additional_context_file)):
+            additional_text = extract_text_from_file(additional_context_file)
+        if "Error" in (additional_text or ""):
+            errors.append(f"Additional Context Extraction: {additional_text}")
+        else:
+            progress("Summarizing additional context...")
+            with profile_stage(profiler, "summarize_additional", text_chars=len(additional_text)):
+                summaries['additional'] = summarize_text_with_ai(additional_text)
+            if "Error" in (summaries['additional'] or ""): errors.append(f"Additional Context Summary: {summaries['additional']}")
+
+    if downloadable_material_file:
+        progress("Extracting downloadable material...")
+        with profile_stage(profiler, "extract_downloadable", **_upload_details(downloadable_material_file)):
+            downloadable_text = extract_text_from_file(downloadable_material_file)
+        if "Error" in (downloadable_text or ""):
+            errors.append(f"Downloadable Material Extraction: {downloadable_text}")
+        else:
+            progress("Summarizing downloadable material...")
+            with profile_stage(profiler, "summarize_downloadable", text_chars=len(downloadable_text)):
+                summaries['downloadable'] = summarize_text_with_ai(downloadable_text)
+            if "Error" in (summaries['downloadable'] or ""): errors.append(f"Downloadable Material Summary: {summaries['downloadable']}")
+
+    full_context = get_combined_context(summaries['url'], summaries['additional'], summaries['downloadable'])
+    if "No context" in full_context and not (summaries['url'] or summaries['additional'] or summaries['downloadable']):
+        errors.append("No usable context was extracted or summarized. Cannot generate ads effectively.")
+    return summaries, full_context, errors
+
+def build_generation_jobs(full_context, lead_objective, links, content_count):
+    """
+    Lists every generation request for one lead objective, in report order.
+    Each job is a dict with the prompt, its task type, a progress "label",
+    and where the result goes ("key", plus "platform"/"ad_objective" for social ads).
+    """
+    jobs = []
+    for i in range(content_count):
+        jobs.append({
+            "key": 'email', "task": "email", "version": i + 1,
+            "label": f"Email content (Version {i+1}/{content_count})",
+            "prompt": create_email_prompt(full_context, lead_objective, links, i + 1),
+        })
+    for platform_name, config in SOCIAL_PLATFORMS.items():
+        for ad_obj in config["objectives"]:
+            for i in range(content_count):
+                jobs.append({
+                    "key": config["key"], "task": "social", "version": i + 1,
+                    "platform": platform_name, "ad_objective": ad_obj,
+                    "label": f"{platform_name} {ad_obj} (V{i+1}/{content_count})",
+                    "prompt": create_linkedin_facebook_prompt(platform_name, full_context, lead_objective, links, ad_obj, i + 1),
+                })
+    jobs.append({
+        "key": 'google_search', "task": "search", "label": "Google Search ads",
+        "prompt": create_google_search_prompt(full_context, lead_objective, links),
+    })
+    jobs.append({
+        "key": 'google_display', "task": "display", "label": "Google Display ads",
+        "prompt": create_google_display_prompt(full_context, lead_objective, links),
+    })
+    return jobs
+
+def apply_generation_result(all_ad_data, job, response, links, errors):
+    """Stores one generation response in all_ad_data, or records why it failed."""
+    key = job["key"]
+    if not (isinstance(response, dict) and "error" not in response):
+        if key == 'email':
+            errors.append(f"Email Gen Error V{job['version']}: {_error_text(response)}")
+        elif key in ('linkedin', 'facebook'):
+            errors.append(f"{job['platform']} {job['ad_objective']} V{job['version']} Error: {_error_text(response)}")
+        else:
+            errors.append(f"{PLATFORM_LABELS[key]} Ads Error: {_error_text(response)}")
+        return
+
+    if key in ('linkedin', 'facebook'):
+        ad_obj = job["ad_objective"]
+        response["destination_url"] = links.get(DESTINATION_LINK_KEYS[ad_obj], '#')
+        response["cta_button"] = CTA_MAP[job["platform"]][ad_obj]
+        response["objective_type"] = ad_obj
+    if isinstance(all_ad_data[key], list):
+        all_ad_data[key].append(response)
+    else:
+        all_ad_data[key] = response
+
+def repair_ad_data(all_ad_data, full_context, errors, progress=_no_progress):
+    """Checks constraints locally and sends each platform's violations in one repair call."""
+    progress("Checking ad copy against length, count and duplicate constraints...")
+    violations = validate_ad_data(all_ad_data)
+    for key, platform_violations in violations.items():
+        progress(f"Fixing {len(platform_violations)} {PLATFORM_LABELS[key]} item(s) that failed checks...")
+        prompt = create_repair_prompt(PLATFORM_LABELS[key], full_context, platform_violations)
+        response = generate_content_with_ai(prompt, task=PLATFORM_TASKS[key])
+        if isinstance(response, dict) and "error" not in response:
+            apply_repairs(all_ad_data, key, platform_violations, response)
+        else: errors.append(f"{PLATFORM_LABELS[key]} Repair Error: {_error_text(response)}")
+    if violations:
+        remaining = validate_ad_data(all_ad_data)
+        for key, platform_violations in remaining.items():
+            errors.append(f"{PLATFORM_LABELS[key]} Constraint Check: {len(platform_violations)} item(s) still violate length/count/duplicate limits after repair.")
+
+def count_generated_ads(all_ad_data):
+    """Per-objective ad counts used by the reasoning prompt."""
+    def count(key, objective):
+        return sum(1 for ad in all_ad_data[key] if ad.get("objective_type") == objective)
+    return {
+        'email': len(all_ad_data['email']),
+        'linkedin_awareness': count('linkedin', "Brand Awareness"),
+        'linkedin_demand_gen': count('linkedin', "Demand Gen"),
+        'linkedin_demand_capture': count('linkedin', "Demand Capture"),
+        'facebook_awareness': count('facebook', "Brand Awareness"),
+        'facebook_demand_gen': count('facebook', "Demand Gen"),
+        'facebook_demand_capture': count('facebook', "Demand Capture"),
+    }
+
+def add_reasoning(all_ad_data, summaries, ai_reasoning_text, errors):
+    """Fills the Reasoning sheet from the summaries and the reasoning response."""
+    reasoning_failed = isinstance(ai_reasoning_text, str) and "Error" in ai_reasoning_text
+    all_ad_data['reasoning'] = {
+        'url_summary': summaries['url'] or "Not provided/extracted.",
+        'additional_summary': summaries['additional'] or "Not provided/extracted.",
+        'downloadable_summary': summaries['downloadable'] or "Not provided/extracted.",
+        'ai_reasoning': ai_reasoning_text if not reasoning_failed else "Could not generate AI reasoning."
+    }
+    if reasoning_failed: errors.append(f"AI Reasoning Error: {ai_reasoning_text}")
+
+def new_ad_data():
+    return {
+        'email': [], 'linkedin': [], 'facebook': [],
+        'google_search': {}, 'google_display': {},
+        'reasoning': {}
+    }
+
+def has_ad_content(all_ad_data):
+    return any(all_ad_data[key] for key in ['email', 'linkedin', 'facebook', 'google_search', 'google_display'])
+
+def generate_campaign(full_context, summaries, lead_objective, links, content_count, progress=_no_progress, profiler=None,
+                      cancel_event=None):
+    """
+    Runs the generation phase for one lead objective against an already-built context.
+    Returns (all_ad_data, errors); all_ad_data is ready for create_excel_report.
+    Once `cancel_event` (a threading.Event) is set, no further requests are sent
+    and the partial all_ad_data is returned with a "Generation cancelled." error.
+    """
+    errors = []
+    all_ad_data = new_ad_data()
+
+    jobs = build_generation_jobs(full_context, lead_objective, links, content_count)
+    with profile_stage(profiler, f"generate [{lead_objective}]", requests=len(jobs), content_count=content_count):
+        for job in jobs:
+            if _is_cancelled(cancel_event):
+                break
+            progress(f"Generating {job['label']}...")
+            response = generate_content_with_ai(job["prompt"], task=job["task"])
+            apply_generation_result(all_ad_data, job, response, links, errors)
+    if _is_cancelled(cancel_event):
+        errors.append("Generation cancelled.")
+        return all_ad_data, errors
+
+    with profile_stage(profiler, f"validate_repair [{lead_objective}]"):
+        repair_ad_data(all_ad_data, full_context, errors, progress)
+
+    progress("Generating AI reasoning explanation...")
+    with profile_stage(profiler, f"reasoning [{lead_objective}]"):
+        prompt = create_reasoning_prompt(summaries['url'], summaries['additional'], summaries['downloadable'], count_generated_ads(all_ad_data))
+        ai_reasoning_text = generate_content_with_ai(prompt, expect_json=False, task="reasoning")
+    add_reasoning(all_ad_data, summaries, ai_reasoning_text, errors)
+    return all_ad_data, errors
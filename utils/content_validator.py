@@ -0,0 +1,186 @@
+# utils/content_validator.py
+import re
+import zlib
+
+# Hard limits stated in the prompts in prompt_builder.py.
+# Per-item field limits apply to list platforms (one dict per ad version);
+# list limits apply to Google's single dict of headline/description lists.
+FIELD_MAX_CHARS = {
+    'linkedin': {'ad_name': 250, 'introductory_text': 400, 'headline': 70},
+    'facebook': {'ad_name': 250, 'primary_text': 400, 'headline': 27, 'link_description': 27},
+}
+LIST_CONSTRAINTS = {
+    'google_search': {
+        'headlines': {'count': 15, 'max_chars': 30},
+        'descriptions': {'count': 4, 'max_chars': 90},
+    },
+    'google_display': {
+        'headlines': {'count': 5, 'max_chars': 30},
+        'descriptions': {'count': 5, 'max_chars': 90},
+    },
+}
+# Fields compared when looking for near-duplicate versions.
+DUPLICATE_FIELDS = {
+    'email': ['subject_line', 'body'],
+    'linkedin': ['introductory_text', 'headline'],
+    'facebook': ['primary_text', 'headline'],
+}
+
+SHINGLE_SIZE = 5 # Characters per shingle; works for 30-char headlines and long bodies alike
+MINHASH_PERMUTATIONS = 64
+NEAR_DUPLICATE_THRESHOLD = 0.7 # Estimated Jaccard similarity
+_MERSENNE_PRIME = (1 << 61) - 1
+
+def _shingle_hashes(text):
+    """Returns the set of hashed character n-grams of the normalized copy."""
+    normalized = " ".join(re.findall(r"\w+", (text or "").lower())).ljust(SHINGLE_SIZE)
+    return {
+        zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode("utf-8"))
+        for i in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+
+def minhash_signatures(texts, num_perm=MINHASH_PERMUTATIONS, seed=0):
+    """
+    Computes a (len(texts), num_perm) MinHash signature matrix.
+    All shingles of all texts are hashed through every permutation in one
+    vectorized pass, then reduced per text with a segmented minimum.
+    """
+    import numpy as np
+
+    shingle_sets = [np.fromiter(_shingle_hashes(t), dtype=np.uint64) for t in texts]
+    lengths = np.array([len(s) for s in shingle_sets])
+    all_shingles = np.concatenate(shingle_sets)
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    # Shingle hashes are 32-bit, so a * x can overflow uint64; wrapping is fine
+    # because we only need a fixed, well-mixed permutation per column.
+    hashed = (all_shingles[:, None] * a[None, :] + b[None, :]) % np.uint64(_MERSENNE_PRIME)
+
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return np.minimum.reduceat(hashed, offsets, axis=0)
+
+def find_near_duplicates(texts, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Returns (i, j, similarity) for every pair i < j whose estimated Jaccard
+    similarity is at or above `threshold`.
+    """
+    if len(texts) < 2:
+        return []
+    import numpy as np
+
+    signatures = minhash_signatures(texts)
+    similarity = (signatures[:, None, :] == signatures[None, :, :]).mean(axis=2)
+    rows, cols = np.nonzero(np.triu(similarity >= threshold, k=1))
+    return [(int(i), int(j), float(similarity[i, j])) for i, j in zip(rows, cols)]
+
+def _check_length(value, max_chars, label):
+    length = len(value or "")
+    if length > max_chars:
+        return f"{label} is {length} characters; the limit is {max_chars}."
+    return None
+
+def _validate_item_list(key, items):
+    """Collects length and near-duplicate issues for one-dict-per-version platforms."""
+    issues = {}
+    for index, ad in enumerate(items):
+        for field, max_chars in FIELD_MAX_CHARS.get(key, {}).items():
+            problem = _check_length(ad.get(field), max_chars, field)
+            if problem:
+                issues.setdefault(index, {})[field] = problem
+
+    fields = DUPLICATE_FIELDS.get(key)
+    if fields:
+        # Versions only need to differ from others with the same ad objective.
+        groups = {}
+        for index, ad in enumerate(items):
+            groups.setdefault(ad.get("objective_type"), []).append(index)
+        for indices in groups.values():
+            texts = [" ".join(str(items[i].get(f, "")) for f in fields) for i in indices]
+            for i, j, similarity in find_near_duplicates(texts):
+                # Keep the earlier version and ask for the later one to be rewritten.
+                duplicate_issues = issues.setdefault(indices[j], {})
+                for field in fields:
+                    duplicate_issues.setdefault(
+                        field,
+                        f"Near-duplicate of version {indices[i] + 1} ({similarity:.0%} similar); rewrite with a distinct angle."
+                    )
+    return [
+        {"index": index, "current": items[index], "issues": field_issues}
+        for index, field_issues in sorted(issues.items())
+    ]
+
+def _validate_lists(key, ad_set):
+    """Collects count, length and near-duplicate issues for Google's headline/description lists."""
+    field_issues = {}
+    for field, constraint in LIST_CONSTRAINTS[key].items():
+        values = ad_set.get(field) or []
+        problems = []
+        if len(values) != constraint['count']:
+            problems.append(f"Has {len(values)} entries; exactly {constraint['count']} are required.")
+        for position, value in enumerate(values):
+            problem = _check_length(value, constraint['max_chars'], f"Entry {position + 1}")
+            if problem:
+                problems.append(problem)
+        reported = set()
+        for i, j, similarity in find_near_duplicates([str(v) for v in values]):
+            if j in reported:
+                continue
+            reported.add(j)
+            problems.append(f"Entry {j + 1} is a near-duplicate of entry {i + 1} ({similarity:.0%} similar).")
+        if problems:
+            field_issues[field] = " ".join(problems)
+    if not field_issues:
+        return []
+    return [{"index": 0, "current": ad_set, "issues": field_issues}]
+
+def validate_ad_data(all_ad_data):
+    """
+    Checks generated ad copy against the prompt constraints without calling the API.
+    Returns {platform_key: [violation, ...]}, where each violation is a dict with
+    the item "index", its "current" content and an "issues" dict of field -> message.
+    Platforms without violations are omitted.
+    """
+    violations = {}
+    for key in ['email', 'linkedin', 'facebook']:
+        items = all_ad_data.get(key) or []
+        found = _validate_item_list(key, items)
+        if found:
+            violations[key] = found
+    for key in LIST_CONSTRAINTS:
+        ad_set = all_ad_data.get(key)
+        if ad_set:
+            found = _validate_lists(key, ad_set)
+            if found:
+                violations[key] = found
+    return violations
+
+def _is_valid_repair(key, field, value):
+    if field in LIST_CONSTRAINTS.get(key, {}):
+        return isinstance(value, list) and bool(value) and all(isinstance(item, str) for item in value)
+    return isinstance(value, str) and bool(value.strip())
+
+def apply_repairs(all_ad_data, key, violations, repair_response):
+    """
+    Merges a batched repair response ({"items": [{"index": i, field: value, ...}]})
+    into all_ad_data[key]. Only fields that were flagged for that item are replaced,
+    and only by a value of the right shape: a list of strings for list fields, a
+    non-empty string otherwise. Anything else leaves the field as it was, so
+    re-validation still reports it. Returns the number of fields updated.
+    """
+    flagged = {v["index"]: v["issues"] for v in violations}
+    updated = 0
+    for fixed in repair_response.get("items", []) if isinstance(repair_response, dict) else []:
+        try:
+            index = int(fixed.get("index"))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if index not in flagged:
+            continue
+        target = all_ad_data[key] if key in LIST_CONSTRAINTS else all_ad_data[key][index]
+        for field in flagged[index]:
+            if field in fixed and _is_valid_repair(key, field, fixed[field]):
+                target[field] = fixed[field]
+                updated += 1
+    return updated
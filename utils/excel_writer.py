@@ -1,17 +1,18 @@
 # utils/excel_writer.py
-import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from openpyxl.utils import get_column_letter
+# openpyxl is imported inside the functions below so the app script stays cheap
+# to re-run; it is only needed once a report is actually built.
 from io import BytesIO
 
 def style_sheet(ws):
     """Applies general styling to a worksheet."""
+    from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+    from openpyxl.utils import get_column_letter
+
     header_font = Font(color="FFFFFF", bold=True)
     header_fill = PatternFill(start_color="000000", end_color="000000", fill_type="solid")
     header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
     
-    content_alignment = Alignment(vertical="middle", wrap_text=True, shrink_to_fit=False) # Allow wrap_text to expand row height
+    content_alignment = Alignment(vertical="center", wrap_text=True, shrink_to_fit=False) # Allow wrap_text to expand row height
     
     thin_border_side = Side(border_style="thin", color="000000")
     cell_border = Border(left=thin_border_side, right=thin_border_side, top=thin_border_side, bottom=thin_border_side)
@@ -46,7 +47,7 @@ def style_sheet(ws):
         if column_letter == 'A' and ws.title in ["Email", "LinkedIn", "FaceBook"]: # Version #
             ws.column_dimensions[column_letter].width = 10
             for cell in ws[column_letter]:
-                cell.alignment = Alignment(horizontal="center", vertical="middle")
+                cell.alignment = Alignment(horizontal="center", vertical="center")
         else:
             ws.column_dimensions[column_letter].width = adjusted_width
         
@@ -60,6 +61,9 @@ def style_sheet(ws):
 
 def create_excel_report(all_ad_data, company_name, lead_objective_user_selection):
     """Creates an Excel report from the generated ad data."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment
+
     wb = Workbook()
     wb.remove(wb.active) # Remove default sheet
 
@@ -200,4 +204,17 @@ def create_excel_report(all_ad_data, company_name, lead_objective_user_selection
     filename_company_part = company_name.replace("www.", "").split('.')[0] if company_name else "company"
     filename = f"{filename_company_part}_{lead_objective_user_selection.lower().replace(' ', '_')}.xlsx"
     
-    return excel_bytes, filename
\ No newline at end of file
+    return excel_bytes, filename
+
+def create_zip_archive(reports, company_name):
+    """Bundles several (excel_bytes, filename) reports into one zip file."""
+    import zipfile
+
+    archive_bytes = BytesIO()
+    with zipfile.ZipFile(archive_bytes, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for excel_bytes, filename in reports:
+            archive.writestr(filename, excel_bytes.getvalue())
+    archive_bytes.seek(0)
+
+    filename_company_part = company_name.replace("www.", "").split('.')[0] if company_name else "company"
+    return archive_bytes, f"{filename_company_part}_campaigns.zip"
@@ -0,0 +1,197 @@
+# utils/profiler.py
+# Opt-in CPU and memory profiling of pipeline stages. Each stage gets its own
+# cProfile run and tracemalloc peak, so load can be traced back to a specific
+# upload, objective or report.
+import contextlib
+import cProfile
+import functools
+import io
+import marshal
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+import zipfile
+
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+
+# cProfile and tracemalloc are process-wide, so profiled stages from different
+# sessions (Streamlit reruns share the process) take turns through this lock.
+_stage_lock = threading.Lock()
+# The stage running on the current thread, so work it hands to worker threads
+# can be profiled into it (see follow_stage).
+_active = threading.local()
+
+REPORT_SCOPE_NOTE = (
+    "Function profiles cover the stage's own thread plus work it handed to worker threads "
+    "(e.g. hedged API calls). CPU time and peak memory are process-wide: they include every "
+    "thread, and any other session that was busy while the stage ran."
+)
+
+class StageProfiler:
+    """
+    Collects per-stage profiles. Use as:
+
+        profiler = StageProfiler()
+        with profiler.stage("extract_additional", filename="deck.pdf", size_bytes=1234):
+            ...
+
+    Stages must not be nested. Stages from different threads or sessions are
+    serialized by a module-level lock, because tracemalloc peaks are process-wide.
+    cProfile only sees the calling thread, so code that hands work to a thread
+    pool wraps it in follow_stage().
+    """
+
+    def __init__(self, top_functions=TOP_FUNCTIONS, top_allocations=TOP_ALLOCATIONS):
+        self.top_functions = top_functions
+        self.top_allocations = top_allocations
+        self.stages = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name, **details):
+        """Profiles the enclosed block as one stage; `details` are copied into the report."""
+        with _stage_lock:
+            with self._profile(name, details):
+                yield
+
+    @contextlib.contextmanager
+    def _profile(self, name, details):
+        stage = {"name": name, "details": details, "worker_stats": []}
+        _active.stage = (self, stage)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profile = cProfile.Profile()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            _active.stage = None
+            wall_seconds = time.perf_counter() - wall_start
+            cpu_seconds = time.process_time() - cpu_start
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ])
+            if started_tracing:
+                tracemalloc.stop()
+            profile.create_stats()
+            stage.update({
+                "wall_seconds": wall_seconds,
+                "cpu_seconds": cpu_seconds,
+                "peak_bytes": peak_bytes,
+                "stats": profile.stats,
+                "top_allocations": snapshot.statistics("lineno")[:self.top_allocations],
+            })
+            with self._lock:
+                self.stages.append(stage)
+
+    def _add_worker_stats(self, stage, stats):
+        with self._lock:
+            stage["worker_stats"].append(stats)
+
+    def _merged_stats(self, stage):
+        """The stage thread's pstats data with every worker thread's profile added in."""
+        merged = pstats.Stats(stream=io.StringIO())
+        with self._lock:
+            all_stats = [stage["stats"]] + list(stage["worker_stats"])
+        for stats in all_stats:
+            part = pstats.Stats(stream=io.StringIO())
+            part.stats = dict(stats) # Stats(profile) would consume the profile's data
+            part.get_top_level_stats()
+            merged.add(part)
+        return merged
+
+    def _format_stage(self, stage):
+        lines = [f"=== Stage: {stage['name']} ==="]
+        for key, value in stage["details"].items():
+            lines.append(f"{key}: {value}")
+        lines.append(f"Wall time: {stage['wall_seconds']:.3f} s")
+        lines.append(f"CPU time (process): {stage['cpu_seconds']:.3f} s")
+        lines.append(f"Peak traced memory: {stage['peak_bytes'] / (1024 * 1024):.2f} MB")
+
+        if stage["worker_stats"]:
+            lines.append(f"Worker threads profiled: {len(stage['worker_stats'])}")
+        stats_output = io.StringIO()
+        stats = self._merged_stats(stage)
+        stats.stream = stats_output
+        stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_functions)
+        lines.append(f"Top {self.top_functions} functions by cumulative time:")
+        lines.append(stats_output.getvalue().strip())
+
+        lines.append(f"Top {self.top_allocations} allocation sites still held at stage end:")
+        for statistic in stage["top_allocations"]:
+            lines.append(f"  {statistic}")
+        return "\n".join(lines)
+
+    def build_report(self):
+        """Returns a plain-text report of every stage, slowest first in the summary."""
+        with self._lock:
+            stages = list(self.stages)
+        lines = [REPORT_SCOPE_NOTE, "", "Stage summary (wall s / CPU s / peak MB):"]
+        for stage in sorted(stages, key=lambda s: s["wall_seconds"], reverse=True):
+            lines.append(
+                f"  {stage['name']:<40} {stage['wall_seconds']:8.3f} {stage['cpu_seconds']:8.3f} "
+                f"{stage['peak_bytes'] / (1024 * 1024):8.2f}"
+            )
+        for stage in stages:
+            lines.append("")
+            lines.append(self._format_stage(stage))
+        return "\n".join(lines)
+
+    def build_archive(self, company_name):
+        """
+        Zips the text report and one .prof file per stage. The .prof files use the
+        cProfile/pstats format, so they open in pstats, snakeviz or tuna.
+        """
+        with self._lock:
+            stages = list(self.stages)
+        archive_bytes = io.BytesIO()
+        with zipfile.ZipFile(archive_bytes, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("profile_report.txt", self.build_report())
+            for position, stage in enumerate(stages, start=1):
+                safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", stage["name"])
+                archive.writestr(f"{position:02d}_{safe_name}.prof", marshal.dumps(self._merged_stats(stage).stats))
+        archive_bytes.seek(0)
+
+        filename_company_part = company_name.replace("www.", "").split('.')[0] if company_name else "company"
+        return archive_bytes, f"{filename_company_part}_profile.zip"
+
+def follow_stage(fn):
+    """
+    Wraps `fn` so that, when it runs on another thread, it is profiled into the
+    stage active on the calling thread. Without an active stage it returns `fn`.
+    """
+    active = getattr(_active, "stage", None)
+    if active is None:
+        return fn
+    profiler, stage = active
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError: # Another profiler already owns this thread
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            profile.create_stats()
+            profiler._add_worker_stats(stage, profile.stats)
+    return wrapper
+
+def profile_stage(profiler, name, **details):
+    """profiler.stage(...) if profiling is enabled, otherwise a no-op context."""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.stage(name, **details)
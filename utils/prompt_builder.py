@@ -1,4 +1,5 @@
 # utils/prompt_builder.py
+import json
 
 def get_combined_context(url_summary, additional_summary, downloadable_summary):
     context_parts = []
@@ -197,4 +198,42 @@ def create_reasoning_prompt(url_summary, additional_summary, downloadable_summar
     This explanation is for transparency, to help the user understand the connection between their input materials and the generated ads.
     Keep the explanation concise yet informative, around 3-5 paragraphs.
     Do not output JSON. Output plain text.
-    """
\ No newline at end of file
+    """
+
+def create_repair_prompt(platform_label, full_context, violations):
+    # violations: output of content_validator.validate_ad_data for one platform.
+    # All flagged items go into a single request so each platform costs one call.
+    items_to_fix = [
+        {
+            "index": v["index"],
+            "current": {k: val for k, val in v["current"].items() if k in v["issues"]},
+            "issues": v["issues"],
+        }
+        for v in violations
+    ]
+    example_item = {"index": items_to_fix[0]["index"]}
+    example_item.update({field: "Corrected value" for field in items_to_fix[0]["issues"]})
+
+    return f"""
+    Company & Material Context:
+    ---
+    {full_context}
+    ---
+
+    Task: Fix {platform_label} ad copy that failed automated checks.
+    Each item below lists its current values and the issues found.
+
+    Items to fix:
+    {json.dumps(items_to_fix, indent=2, ensure_ascii=False)}
+
+    Requirements:
+    -   Rewrite only the fields listed under "issues" for each item; keep the message and objective.
+    -   Respect every character limit strictly (count characters, including spaces and emojis).
+    -   Where an exact number of entries is required, return a list with exactly that many entries.
+    -   Near-duplicates must be rewritten with a clearly different angle, hook, or benefit.
+
+    Output the response as a single JSON object with one key: "items" (a list with one object per item above,
+    containing its "index" and the corrected fields).
+    Example JSON:
+    {json.dumps({"items": [example_item]}, indent=2)}
+    """
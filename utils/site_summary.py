@@ -0,0 +1,91 @@
+# utils/site_summary.py
+# Incremental website summaries. Each crawled page is fingerprinted and its
+# summary cached on disk, so a repeat crawl of the same site only summarizes
+# pages that are new or whose text changed since the last run.
+import hashlib
+import json
+import os
+import re
+import time
+from urllib.parse import urlparse
+
+from utils.ai_helper import summarize_text_with_ai
+
+SITE_CACHE_DIR = os.environ.get("SITE_SUMMARY_CACHE_DIR", ".site_cache")
+
+def page_fingerprint(text):
+    """Hash of the page text with whitespace normalized, so reflowed markup doesn't count as a change."""
+    normalized = " ".join((text or "").split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def _cache_path(site_url, cache_dir):
+    if not site_url.startswith(('http://', 'https://')):
+        site_url = 'https://' + site_url
+    host = urlparse(site_url).netloc.lower() or "site"
+    safe_host = re.sub(r"[^a-z0-9.-]+", "_", host)
+    return os.path.join(cache_dir, f"{safe_host}.json")
+
+def load_page_cache(site_url, cache_dir=SITE_CACHE_DIR):
+    """Returns {page_url: {"fingerprint", "summary", "updated_at"}} from the last run, or {}."""
+    try:
+        with open(_cache_path(site_url, cache_dir), encoding="utf-8") as cache_file:
+            return json.load(cache_file).get("pages", {})
+    except (OSError, ValueError):
+        return {}
+
+def save_page_cache(site_url, pages, cache_dir=SITE_CACHE_DIR):
+    """Writes the page cache atomically so an interrupted run can't leave a corrupt file."""
+    path = _cache_path(site_url, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as cache_file:
+        json.dump({"site_url": site_url, "pages": pages}, cache_file, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+def merge_page_summaries(page_summaries):
+    """Combines per-page summaries, in crawl order, into one site summary."""
+    if len(page_summaries) == 1:
+        return next(iter(page_summaries.values()))
+    return "\n\n".join(f"Page: {page_url}\n{summary}" for page_url, summary in page_summaries.items())
+
+def summarize_site_pages(site_url, pages, use_cache=True, cache_dir=SITE_CACHE_DIR):
+    """
+    Summarizes the crawled `pages` ({page_url: text}) into one site summary,
+    re-summarizing only pages that are new or changed since the cached run.
+    Returns (site_summary, stats) where stats counts "summarized", "reused" and
+    "failed" pages. site_summary is an error string if no page could be summarized.
+    """
+    cached_pages = load_page_cache(site_url, cache_dir) if use_cache else {}
+    page_summaries = {}
+    updated_cache = {}
+    stats = {"summarized": 0, "reused": 0, "failed": 0}
+    last_error = None
+
+    for page_url, text in pages.items():
+        fingerprint = page_fingerprint(text)
+        cached = cached_pages.get(page_url)
+        if cached and cached.get("fingerprint") == fingerprint and cached.get("summary"):
+            page_summaries[page_url] = cached["summary"]
+            updated_cache[page_url] = cached
+            stats["reused"] += 1
+            continue
+
+        summary = summarize_text_with_ai(text)
+        if "Error" in (summary or ""):
+            # Not cached, so the page is retried on the next run.
+            last_error = summary
+            stats["failed"] += 1
+            continue
+        page_summaries[page_url] = summary
+        updated_cache[page_url] = {"fingerprint": fingerprint, "summary": summary, "updated_at": int(time.time())}
+        stats["summarized"] += 1
+
+    if use_cache and stats["summarized"]:
+        # Pages that were not crawled this time are dropped from the cache.
+        try:
+            save_page_cache(site_url, updated_cache, cache_dir)
+        except OSError:
+            pass # A read-only cache directory only costs the next run its savings
+    if not page_summaries:
+        return last_error or "Error: No website pages with text to summarize.", stats
+    return merge_page_summaries(page_summaries), stats
@@ -1,45 +1,108 @@
 # utils/text_extractor.py
-import requests
-from bs4 import BeautifulSoup
-import PyPDF2
-from pptx import Presentation
+# requests, BeautifulSoup, PyPDF2 and python-pptx are imported inside the functions
+# that use them: Streamlit re-runs the app script on every interaction and most
+# reruns never extract anything.
+import contextlib
 import io
+import mmap
+import os
+import shutil
+import tempfile
 
-def extract_text_from_url(url):
-    """Extracts all text content from a given URL."""
-    try:
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Remove script and style elements
-        for script_or_style in soup(["script", "style"]):
-            script_or_style.decompose()
-        
-        # Get text
-        text = soup.get_text(separator='\n', strip=True)
-        return text
-    except requests.exceptions.RequestException as e:
-        return f"Error fetching URL: {e}"
-    except Exception as e:
-        return f"Error parsing URL content: {e}"
+# Per-upload size limit; matches Streamlit's default server.maxUploadSize.
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+# Non-seekable uploads are buffered in memory up to this size, then spooled to disk.
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+# Files on disk at least this large are read through a memory map.
+MMAP_MIN_BYTES = 16 * 1024 * 1024
+
+# Pages crawled per site unless the caller asks for more. Every extra page adds its
+# summary to the context sent with each generation prompt, so this stays at 1.
+DEFAULT_MAX_PAGES = 1
+# Links with these extensions are downloads or media, not pages worth crawling.
+NON_PAGE_EXTENSIONS = ('.pdf', '.zip', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.mp4', '.mp3', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx')
+
+def _fetch_soup(url):
+    """Fetches a page and returns (final_url, BeautifulSoup); raises on HTTP errors."""
+    import requests
+    from bs4 import BeautifulSoup
+    response = requests.get(url, timeout=15)
+    response.raise_for_status()  # Raise an exception for HTTP errors
+    return response.url, BeautifulSoup(response.content, 'html.parser')
+
+def _soup_to_text(soup):
+    # Remove script and style elements
+    for script_or_style in soup(["script", "style"]):
+        script_or_style.decompose()
+
+    # Get text
+    return soup.get_text(separator='\n', strip=True)
+
+def _same_site_links(page_url, soup):
+    """Returns absolute, fragment-free links from the page that stay on the same host."""
+    from urllib.parse import urljoin, urldefrag, urlparse
+    host = urlparse(page_url).netloc.lower()
+    links = []
+    for anchor in soup.find_all("a", href=True):
+        link = urldefrag(urljoin(page_url, anchor["href"]))[0]
+        parsed = urlparse(link)
+        if parsed.scheme not in ('http', 'https') or parsed.netloc.lower() != host:
+            continue
+        if parsed.path.lower().endswith(NON_PAGE_EXTENSIONS):
+            continue
+        links.append(link)
+    return links
+
+def extract_pages_from_site(url, max_pages=DEFAULT_MAX_PAGES):
+    """
+    Crawls up to `max_pages` pages of the site breadth-first, starting at `url`
+    and following same-host links. Returns {page_url: text} in crawl order, or an
+    error string if the start page itself cannot be fetched. Pages that fail
+    after the first are skipped.
+    """
+    import requests
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+
+    pages = {}
+    queue = [url]
+    seen = {url}
+    while queue and len(pages) < max_pages:
+        page_url = queue.pop(0)
+        try:
+            final_url, soup = _fetch_soup(page_url)
+            for link in _same_site_links(final_url, soup):
+                if link not in seen:
+                    seen.add(link)
+                    queue.append(link)
+            text = _soup_to_text(soup)
+        except requests.exceptions.RequestException as e:
+            if not pages:
+                return f"Error fetching URL: {e}"
+            continue
+        except Exception as e:
+            if not pages:
+                return f"Error parsing URL content: {e}"
+            continue
+        if text and final_url not in pages:
+            pages[final_url] = text
+    return pages
 
 def extract_text_from_pdf(file_obj):
     """Extracts text from a PDF file object."""
+    import PyPDF2
     try:
         pdf_reader = PyPDF2.PdfReader(file_obj)
-        text = ""
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text()
-        return text
+        text = []
+        for page in pdf_reader.pages:
+            text.append(page.extract_text() or "")
+        return "".join(text)
     except Exception as e:
         return f"Error reading PDF: {e}"
 
 def extract_text_from_ppt(file_obj):
     """Extracts text from a PPTX file object."""
+    from pptx import Presentation
     try:
         prs = Presentation(file_obj)
         text = []
@@ -51,20 +114,146 @@ def extract_text_from_ppt(file_obj):
     except Exception as e:
         return f"Error reading PPTX: {e}"
 
-def extract_text_from_file(uploaded_file):
+def get_upload_size(uploaded_file):
+    """Returns the size of an uploaded file in bytes without reading it."""
+    size = getattr(uploaded_file, "size", None)
+    if size is not None:
+        return size
+    if hasattr(uploaded_file, "fileno"):
+        try:
+            return os.fstat(uploaded_file.fileno()).st_size
+        except (OSError, io.UnsupportedOperation):
+            pass
+    if _is_seekable(uploaded_file):
+        position = uploaded_file.tell()
+        size = uploaded_file.seek(0, io.SEEK_END)
+        uploaded_file.seek(position)
+        return size
+    return None
+
+def _is_seekable(file_obj):
+    seekable = getattr(file_obj, "seekable", None)
+    return bool(seekable and seekable())
+
+class _MappedFile(io.RawIOBase):
+    """Read-only file interface over an mmap, so parsers can seek without a copy."""
+
+    def __init__(self, mapped):
+        self._mapped = mapped
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._mapped.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._mapped.seek(offset, whence)
+        return self._mapped.tell()
+
+    def tell(self):
+        return self._mapped.tell()
+
+@contextlib.contextmanager
+def _mmap_file(file_obj):
+    """Maps a file on disk read-only so pages are loaded by the OS on demand."""
+    with mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield _MappedFile(mapped)
+
+class UploadTooLargeError(ValueError):
+    """Raised when a stream of unknown size turns out to be larger than the upload limit."""
+
+def _upload_limit_message(name, max_bytes, size=None):
+    limit = f"the {max_bytes / (1024 * 1024):.0f} MB upload limit"
+    if size is None:
+        return f"Error: '{name}' exceeds {limit}."
+    return f"Error: '{name}' is {size / (1024 * 1024):.1f} MB, which exceeds {limit}."
+
+def _copy_with_limit(source, destination, max_bytes):
+    """Copies in chunks, raising UploadTooLargeError as soon as more than `max_bytes` is read."""
+    copied = 0
+    while True:
+        chunk = source.read(shutil.COPY_BUFSIZE)
+        if not chunk:
+            return copied
+        copied += len(chunk)
+        if max_bytes and copied > max_bytes:
+            raise UploadTooLargeError(f"upload exceeds {max_bytes} bytes")
+        destination.write(chunk)
+
+@contextlib.contextmanager
+def open_upload_stream(uploaded_file, size=None, max_bytes=None):
+    """
+    Yields a seekable, read-only stream over the upload without copying it.
+    Seekable uploads (e.g. Streamlit's UploadedFile) are rewound and used as-is,
+    large on-disk files are memory-mapped, and anything else is copied once into
+    a spooled temporary file, stopping with UploadTooLargeError past `max_bytes`.
+    """
+    if size is None:
+        size = get_upload_size(uploaded_file)
+
+    if _is_seekable(uploaded_file):
+        on_disk = False
+        if hasattr(uploaded_file, "fileno"):
+            try:
+                uploaded_file.fileno()
+                on_disk = True
+            except (OSError, io.UnsupportedOperation):
+                pass
+        if on_disk and size and size >= MMAP_MIN_BYTES:
+            with _mmap_file(uploaded_file) as mapped:
+                yield mapped
+            return
+        position = uploaded_file.tell()
+        uploaded_file.seek(0)
+        try:
+            yield uploaded_file
+        finally:
+            uploaded_file.seek(position)
+        return
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+        _copy_with_limit(uploaded_file, spool, max_bytes)
+        if spool.tell() >= MMAP_MIN_BYTES:
+            spool.rollover()
+            spool.flush()
+            with _mmap_file(spool) as mapped:
+                yield mapped
+            return
+        spool.seek(0)
+        yield spool
+
+def extract_text_from_file(uploaded_file, max_bytes=MAX_UPLOAD_BYTES):
     """
     Detects file type and extracts text accordingly.
-    `uploaded_file` is a Streamlit UploadedFile object.
+    `uploaded_file` is a Streamlit UploadedFile object (or any binary file object
+    with `name` and `type` attributes). Uploads larger than `max_bytes` are rejected.
     """
     if uploaded_file is None:
         return None
-        
-    file_bytes = io.BytesIO(uploaded_file.getvalue())
-    file_type = uploaded_file.type
-
-    if "pdf" in file_type:
-        return extract_text_from_pdf(file_bytes)
-    elif "vnd.openxmlformats-officedocument.presentationml.presentation" in file_type or uploaded_file.name.endswith('.pptx'): # PPTX
-        return extract_text_from_ppt(file_bytes)
+
+    size = get_upload_size(uploaded_file)
+    if max_bytes and size is not None and size > max_bytes:
+        return _upload_limit_message(uploaded_file.name, max_bytes, size)
+
+    file_type = getattr(uploaded_file, "type", "") or ""
+
+    if "pdf" in file_type or uploaded_file.name.lower().endswith('.pdf'):
+        extractor = extract_text_from_pdf
+    elif "vnd.openxmlformats-officedocument.presentationml.presentation" in file_type or uploaded_file.name.lower().endswith('.pptx'): # PPTX
+        extractor = extract_text_from_ppt
     else:
-        return "Unsupported file type for text extraction."
\ No newline at end of file
+        return "Unsupported file type for text extraction."
+
+    try:
+        with open_upload_stream(uploaded_file, size, max_bytes) as file_stream:
+            return extractor(file_stream)
+    except UploadTooLargeError:
+        return _upload_limit_message(uploaded_file.name, max_bytes)
+    except (OSError, ValueError) as e:
+        return f"Error reading uploaded file: {e}"